@@ -1,2 +1,5 @@
 from .tool_call_agent import *
-from .baselines import *
\ No newline at end of file
+from .baselines import *
+from .compaction import *
+from .budget import *
+from .double_check import *
\ No newline at end of file
@@ -9,28 +9,32 @@ from litellm import acompletion
 
 from jdr.pretty import print_msg
 from jdr.utils import disk_cache_fn
+from jdr.ratelimit import with_retries
+from jdr.tools.http_client import arequest
 
 async def jina_deepsearch(query, model='jina-deepsearch-v2'):
     JINA_API_KEY = os.getenv('JINA_API_KEY')
     if not JINA_API_KEY:
         raise ValueError('JINA_API_KEY is not set')
 
-    async with httpx.AsyncClient(timeout=None) as client:
-        response = await client.post(
-            'https://deepsearch.jina.ai/v1/chat/completions', 
-            headers = {
-                'Content-Type'  : 'application/json',
-                'Authorization' : f'Bearer {JINA_API_KEY}'
-            }, 
-            json    = {
-                "model"            : model,
-                "messages"         : [{"role" : "user", "content" : query}],
-                "stream"           : False,
-                "reasoning_effort" : "medium",
-                "max_attempts"     : 1,
-                "no_direct_answer" : False
-            }
-        )
+    response = await arequest(
+        'POST',
+        'https://deepsearch.jina.ai/v1/chat/completions', 
+        provider = 'jina-deepsearch',
+        headers  = {
+            'Content-Type'  : 'application/json',
+            'Authorization' : f'Bearer {JINA_API_KEY}'
+        }, 
+        json     = {
+            "model"            : model,
+            "messages"         : [{"role" : "user", "content" : query}],
+            "stream"           : False,
+            "reasoning_effort" : "medium",
+            "max_attempts"     : 1,
+            "no_direct_answer" : False
+        },
+        timeout  = httpx.Timeout(connect=10, read=None, write=30, pool=None), # deepsearch runs for minutes
+    )
     return response.json()
 
 class JinaDeepsearchAgent:
@@ -85,7 +89,7 @@ Today's date is June 23, 2025. You strongly prefer using Wikipedia as your sourc
 
 class GoogleSearchAgent:
     def __init__(self):
-        self._acompletion = disk_cache_fn(acompletion, cache_dir="./.cache/completion", verbose=False)
+        self._acompletion = disk_cache_fn(with_retries(acompletion), cache_dir="./.cache/completion", verbose=False)
     
     async def arun(self, query, **kwargs):
         
@@ -133,7 +137,7 @@ Today's date is June 23, 2025.
 
 class SimpleAgent:
     def __init__(self):
-        self._acompletion = disk_cache_fn(acompletion, cache_dir="./.cache/completion", verbose=False)
+        self._acompletion = disk_cache_fn(with_retries(acompletion), cache_dir="./.cache/completion", verbose=False)
     
     async def arun(self, query, **kwargs):
         
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+    jdr.agents.budget
+
+    Per-question resource budgets for `ToolCallAgent`.  Before each LLM request, the agent checks whether another
+    turn (estimated from the last one) would push it over a limit - if so, it asks the LLM for its final answer
+    w/ tools disabled, instead of being cut off w/o one.
+"""
+
+__all__ = ["Budget"]
+
+FINALIZE_PROMPT = """
+You have run out of {RESOURCE} for this question, and can not use any more tools.
+
+Based on the information you have gathered so far, give your best FINAL ANSWER now, using the same <output>...</output> schema as before.
+If you could not find everything you needed, say so in your answer - but still give your best guess.
+""".strip()
+
+RESOURCES = {
+    "max_time"          : "time",
+    "max_prompt_tokens" : "tokens",
+    "max_tool_calls"    : "tool calls",
+    "max_cost"          : "budget",
+}
+
+class Budget:
+    """
+        max_time          : wall-clock seconds per question
+        max_prompt_tokens : prompt tokens per question, summed over LLM requests
+        max_tool_calls    : tool calls per question
+        max_cost          : dollars per question (`litellm.completion_cost` - limit is ignored for unpriced models)
+
+        A limit is "exhausted" when the amount spent so far plus the last turn's spend would go over it.
+    """
+
+    LIMITS = ["max_time", "max_prompt_tokens", "max_tool_calls", "max_cost"]
+    SPEND  = {"max_time" : "time", "max_prompt_tokens" : "prompt_tokens", "max_tool_calls" : "tool_calls", "max_cost" : "cost"}
+    TAGS   = {"max_time" : "s", "max_prompt_tokens" : "tok", "max_tool_calls" : "tc", "max_cost" : "usd"}
+
+    def __init__(self, max_time=None, max_prompt_tokens=None, max_tool_calls=None, max_cost=None):
+        self.max_time          = max_time
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_tool_calls    = max_tool_calls
+        self.max_cost          = max_cost
+
+    @property
+    def limits(self):
+        return {k:getattr(self, k) for k in self.LIMITS if getattr(self, k) is not None}
+
+    @property
+    def enabled(self):
+        return len(self.limits) > 0
+
+    @property
+    def name(self):
+        """ short tag for output directories, e.g. `300s-40tc` """
+        if not self.enabled:
+            return "none"
+        return "-".join(f"{v:g}{self.TAGS[k]}" for k, v in self.limits.items())
+
+    def exhausted(self, spent, last):
+        """
+            spent : totals so far - {time, prompt_tokens, tool_calls, cost}
+            last  : the same, for the last turn only (estimate of the next one)
+
+            -> name of the first limit the next turn would exceed, or None
+        """
+        for k, limit in self.limits.items():
+            field = self.SPEND[k]
+            if spent.get(field, 0) + last.get(field, 0) > limit:
+                return k
+        return None
+
+    def finalize_prompt(self, limit):
+        return FINALIZE_PROMPT.format(RESOURCE=RESOURCES[limit])
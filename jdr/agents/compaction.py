@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+    jdr.agents.compaction
+
+    Shrink the conversation `ToolCallAgent` sends to the LLM.  The full history is kept in the trace - only the
+    view sent on each request is compacted, and only tool results' `content` changes, so the message structure
+    (tool calls -> tool results) stays valid.
+"""
+
+import asyncio
+from litellm import acompletion
+
+from jdr.utils import disk_cache
+from jdr.ratelimit import with_retries
+
+__all__ = ["Compaction"]
+
+SUMMARY_PROMPT = """
+Below is the result of a `{TOOL}` tool call, made while researching this question:
+
+<question>
+{QUERY}
+</question>
+
+Summarize the tool result in at most {MAX_WORDS} words.  Keep every fact, name, number, date and URL that could help answer the question, and say so if the result is irrelevant.
+
+<tool_result>
+{CONTENT}
+</tool_result>
+""".strip()
+
+CHARS_PER_TOKEN = 4 # rough, but cheap enough to run on every request
+
+_acompletion_with_retries = with_retries(acompletion)
+
+@disk_cache(cache_dir="./.cache/summary", verbose=False, compress="zstd")
+async def _summarize(query, tool, content, model_config, max_words):
+    out = await _acompletion_with_retries(
+        **model_config,
+        messages = [{"role" : "user", "content" : SUMMARY_PROMPT.format(TOOL=tool, QUERY=query, CONTENT=content, MAX_WORDS=max_words)}],
+    )
+    return out.choices[0].message.content
+
+def _n_tokens(messages):
+    return sum(len(m.get('content') or '') for m in messages) // CHARS_PER_TOKEN
+
+
+class Compaction:
+    """
+        method:
+            none     - send everything (default)
+            truncate - keep the first `truncate_chars` characters of old tool results
+            elide    - replace old tool results w/ a one-line placeholder
+            summary  - replace old tool results w/ an LLM summary (computed once per result, cached)
+
+        A tool result is "old" once `keep_last` assistant turns have happened since it was returned.
+
+        max_prompt_tokens: hard budget per request - if the (compacted) view is still over it, tool results are
+            elided oldest-first until it fits.  Tokens are estimated from characters.
+    """
+
+    METHODS = ["none", "truncate", "elide", "summary"]
+
+    def __init__(self, method="none", keep_last=2, truncate_chars=2_000, max_prompt_tokens=None,
+                 summary_model_config=None, summary_words=200):
+
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown compaction method {method} - must be one of {self.METHODS}")
+
+        self.method               = method
+        self.keep_last            = keep_last
+        self.truncate_chars       = truncate_chars
+        self.max_prompt_tokens    = max_prompt_tokens
+        self.summary_model_config = summary_model_config
+        self.summary_words        = summary_words
+
+    @property
+    def enabled(self):
+        return self.method != "none" or self.max_prompt_tokens is not None
+
+    @property
+    def name(self):
+        """ short tag for output directories, e.g. `elide-k2-t200000` """
+        if not self.enabled:
+            return "none"
+
+        out = f"{self.method}-k{self.keep_last}"
+        if self.method == "truncate":
+            out += f"-c{self.truncate_chars}"
+        if self.max_prompt_tokens is not None:
+            out += f"-t{self.max_prompt_tokens}"
+        return out
+
+    def _old_tool_idxs(self, messages):
+        """ indices of tool results returned before the last `keep_last` assistant turns """
+        out         = []
+        n_assistant = 0
+        for i in reversed(range(len(messages))):
+            if messages[i]['role'] == 'assistant':
+                n_assistant += 1
+            elif messages[i]['role'] == 'tool' and n_assistant >= self.keep_last:
+                out.append(i)
+        return out[::-1]
+
+    def _elided(self, msg):
+        return f"[elided: {msg.get('name', 'tool')} result ({len(msg['content'])} chars) - call the tool again if you need it]"
+
+    async def _summaries(self, messages, idxs, query, model_config):
+        """ summaries are stored on the (full) message, so each result is summarized at most once per run """
+        model_config = self.summary_model_config or {k:v for k, v in model_config.items() if k != 'reasoning_effort'}
+        todo         = [i for i in idxs if 'summary' not in messages[i]]
+        summaries    = await asyncio.gather(*[
+            _summarize(query, messages[i].get('name', 'tool'), messages[i]['content'], model_config, self.summary_words) for i in todo
+        ])
+        for i, summary in zip(todo, summaries):
+            messages[i]['summary'] = summary
+
+    async def acompact(self, messages, query, model_config):
+        """ messages (full history) -> view to send to the LLM.  may add `summary` fields to `messages` """
+        if not self.enabled:
+            return messages
+
+        view = [dict(m) for m in messages]
+        idxs = self._old_tool_idxs(messages)
+
+        if self.method == "truncate":
+            for i in idxs:
+                if len(view[i]['content']) > self.truncate_chars:
+                    view[i]['content'] = view[i]['content'][:self.truncate_chars] + f"\n[truncated: {len(view[i]['content']) - self.truncate_chars} more chars]"
+
+        elif self.method == "elide":
+            for i in idxs:
+                view[i]['content'] = self._elided(view[i])
+
+        elif self.method == "summary":
+            await self._summaries(messages, idxs, query, model_config)
+            for i in idxs:
+                view[i]['content'] = f"[summary of {view[i].get('name', 'tool')} result]\n{messages[i]['summary']}"
+
+        if self.max_prompt_tokens is not None:
+            tool_idxs = [i for i, m in enumerate(view) if m['role'] == 'tool']
+            for i in tool_idxs:
+                if _n_tokens(view) <= self.max_prompt_tokens:
+                    break
+                view[i]['content'] = self._elided(messages[i])
+
+        return view
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""
+    jdr.agents.double_check
+
+    Decide whether `ToolCallAgent`'s double-check pass is worth running.  The double-check resends the whole
+    conversation (and often triggers more tool calls), so `DoubleCheckGate` skips it when the first answer looks
+    well-sourced: it has citations, every cited url was actually scraped, and it doesn't hedge.  Optionally, a
+    small model then checks the answer against the cited pages.
+"""
+
+import re
+import json
+from time import perf_counter
+from litellm import acompletion, completion_cost
+
+from jdr.utils import disk_cache
+from jdr.ratelimit import with_retries
+
+__all__ = ["DoubleCheckGate"]
+
+VERIFIER_PROMPT = """
+A research assistant answered the question below, citing the webpages whose (truncated) contents follow.
+
+<question>
+{QUERY}
+</question>
+
+<answer>
+{ANSWER}
+</answer>
+
+<cited_pages>
+{PAGES}
+</cited_pages>
+
+Does the answer address every part of the question, with each claim supported by the cited pages?
+Reply with exactly one word: SUPPORTED or UNSUPPORTED.
+""".strip()
+
+HEDGES = [
+    "unable to", "could not find", "couldn't find", "cannot determine", "can't determine", "not able to",
+    "no information", "i'm not sure", "i am not sure",
+]
+
+_acompletion_with_retries = with_retries(acompletion)
+
+@disk_cache(cache_dir="./.cache/double_check", verbose=False, compress="zstd")
+async def _verify(query, answer, pages, model_config):
+    return await _acompletion_with_retries(
+        **model_config,
+        messages = [{"role" : "user", "content" : VERIFIER_PROMPT.format(QUERY=query, ANSWER=answer, PAGES=pages)}],
+    )
+
+def _tag(content, tag):
+    m = re.search(f"<{tag}>(.*?)</{tag}>", content or "", flags=re.DOTALL)
+    return m.group(1).strip() if m else None
+
+def _scraped_pages(messages):
+    """ url -> content, for every successful tool call w/ a `url` argument """
+    results = {m['tool_call_id'] : m for m in messages if m['role'] == 'tool'}
+    out     = {}
+    for msg in messages:
+        for tool_call in msg.get('tool_calls') or []:
+            try:
+                url = json.loads(tool_call['function']['arguments']).get('url')
+            except (json.JSONDecodeError, TypeError, AttributeError):
+                continue
+
+            result = results.get(tool_call['id'])
+            if url and result is not None and result['metrics'].get('error') is None:
+                out[url] = result['content']
+    return out
+
+
+class DoubleCheckGate:
+    """
+        Heuristics (any one -> double-check):
+            no_output         - no <output><answer> block
+            no_citations      - no cited urls
+            unread_citations  - a cited url was never (successfully) scraped in this run
+            hedged            - the answer says it couldn't find / determine something
+
+        verifier_model_config: if set, answers that pass the heuristics are also checked by this (small) model,
+            against the cited pages (first `verifier_chars` characters of each).  UNSUPPORTED -> double-check.
+    """
+
+    def __init__(self, verifier_model_config=None, verifier_chars=4_000):
+        self.verifier_model_config = verifier_model_config
+        self.verifier_chars        = verifier_chars
+
+    def _reasons(self, answer, citations, pages):
+        reasons = []
+        if not answer:
+            reasons.append("no_output")
+        if not citations:
+            reasons.append("no_citations")
+        if any(url.rstrip('/') not in {p.rstrip('/') for p in pages} for url in citations):
+            reasons.append("unread_citations")
+        if answer and any(hedge in answer.lower() for hedge in HEDGES):
+            reasons.append("hedged")
+        return reasons
+
+    async def _averify(self, query, answer, citations, pages):
+        pages = {url.rstrip('/') : content for url, content in pages.items()}
+        pages = "\n\n".join(f"<page url=\"{url}\">\n{pages[url.rstrip('/')][:self.verifier_chars]}\n</page>" for url in citations)
+        t     = perf_counter()
+        out   = await _verify(query, answer, pages, self.verifier_model_config)
+        try:
+            cost = completion_cost(completion_response=out)
+        except Exception:
+            cost = None
+
+        content = (out.choices[0].message.content or "").upper()
+        return {
+            "verdict"           : "unsupported" if "UNSUPPORTED" in content or "SUPPORTED" not in content else "supported",
+            "llm_time"          : perf_counter() - t,
+            "prompt_tokens"     : getattr(out.usage, 'prompt_tokens', None),
+            "completion_tokens" : getattr(out.usage, 'completion_tokens', None),
+            "cost"              : cost,
+        }
+
+    async def adecide(self, query, messages):
+        """ messages (ending w/ the first final answer) -> {"needed" : bool, "reasons" : [...], ...} """
+        t         = perf_counter()
+        output    = _tag(messages[-1]['content'], "output")
+        answer    = _tag(output, "answer")
+        citations = [url for block in re.findall(r"<url>(.*?)</url>", output or "", flags=re.DOTALL) for url in block.split()]
+        pages     = _scraped_pages(messages)
+
+        out = {"reasons" : self._reasons(answer, citations, pages)}
+        if not out['reasons'] and self.verifier_model_config is not None:
+            out['verifier'] = await self._averify(query, answer, citations, pages)
+            if out['verifier']['verdict'] == "unsupported":
+                out['reasons'].append("verifier")
+
+        out['needed']    = len(out['reasons']) > 0
+        out['gate_time'] = perf_counter() - t
+        return out
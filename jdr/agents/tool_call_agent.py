@@ -10,13 +10,19 @@ os.environ["DEFER_PYDANTIC_BUILD"] = "0"
 
 import asyncio
 from copy import deepcopy
-from litellm import acompletion
+from collections import Counter
+from time import perf_counter
+from litellm import acompletion, completion_cost, BadRequestError, ContextWindowExceededError
 from rich.console import Console
 from rich import print as rprint
 
-from jdr.tools import ToolBox
-from jdr.utils import disk_cache
+from jdr.tools import ToolBox, Prefetcher
+from jdr.utils import disk_cache, last_cache_status
+from jdr.ratelimit import with_retries
 from jdr.pretty import print_msg, print_tool_result
+from jdr.agents.compaction import Compaction
+from jdr.agents.budget import Budget
+from jdr.agents.double_check import DoubleCheckGate
 
 __all__ = ["ToolCallAgent"]
 
@@ -37,29 +43,115 @@ SYSTEM_PROMPT = "jdr/prompts/tool_call_agent_v2.md"
 # Helpers
 
 def _drop_bad_fields(message):
-    BAD = ['reasoning_content', 'provider_specific_fields']
+    BAD = ['reasoning_content', 'provider_specific_fields', 'metrics', 'summary']
     return {k:v for k,v in message.items() if k not in BAD}
 
-@disk_cache(cache_dir="./.cache/completion", verbose=False)
-async def _cached_acompletion(*args, **kwargs):
-    return await acompletion(*args, **kwargs)
+def _llm_metrics(out, llm_time, phase):
+    usage   = getattr(out, 'usage', None)
+    details = getattr(usage, 'completion_tokens_details', None)
+    prompt  = getattr(usage, 'prompt_tokens_details', None)
+    try:
+        cost = completion_cost(completion_response=out)
+    except Exception:
+        cost = None # unknown model pricing
+    
+    return {
+        "phase"              : phase,
+        "llm_time"           : llm_time,
+        "cache"              : last_cache_status(),
+        "prompt_tokens"      : getattr(usage, 'prompt_tokens', None),
+        "completion_tokens"  : getattr(usage, 'completion_tokens', None),
+        "reasoning_tokens"   : getattr(details, 'reasoning_tokens', None),
+        "cached_tokens"      : getattr(prompt, 'cached_tokens', None) or getattr(usage, 'cache_read_input_tokens', None), # provider prompt cache reads
+        "cache_write_tokens" : getattr(usage, 'cache_creation_input_tokens', None),
+        "cost"               : cost, # what the call would cost live, even if it was a cache hit
+    }
+
+# --
+# Prompt caching
+#
+# OpenAI, Gemini 2.5 and DeepSeek cache long prompt prefixes automatically - we just keep the prefix stable.
+# Claude (Anthropic / Bedrock / Vertex) only caches up to explicit `cache_control` breakpoints, so we mark the
+# tools, the system prompt and the end of the conversation so far.
+
+CACHE_CONTROL     = {"type" : "ephemeral"}
+_NO_CACHE_CONTROL = set() # models that rejected `cache_control` - don't try again
+
+def _uses_cache_control(model):
+    return "claude" in model.lower() and model not in _NO_CACHE_CONTROL
+
+def _with_cache_control(messages, tools):
+    """ copies of messages + tools w/ (at most 3) `cache_control` breakpoints """
+    def _mark(msg):
+        return {**msg, "content" : [{"type" : "text", "text" : msg['content'], "cache_control" : CACHE_CONTROL}]}
+    
+    messages = list(messages)
+    if messages and messages[0]['role'] == 'system':
+        messages[0] = _mark(messages[0])
+    
+    for i in reversed(range(1, len(messages))):
+        if isinstance(messages[i].get('content'), str) and messages[i]['content']:
+            messages[i] = _mark(messages[i]) # last message w/ text - everything up to here is cached for the next turn
+            break
+    
+    if tools:
+        tools     = list(tools)
+        tools[-1] = {**tools[-1], "cache_control" : CACHE_CONTROL}
+    
+    return messages, tools
+
+def _is_cache_control_error(e):
+    """ only a 400 that complains about the breakpoints themselves means the model doesn't support them """
+    if isinstance(e, ContextWindowExceededError):
+        return False
+    msg = str(e).lower()
+    return "cache_control" in msg or "cache control" in msg
+
+_acompletion_with_retries = with_retries(acompletion)
+
+@disk_cache(cache_dir="./.cache/completion", verbose=False, compress="zstd", ignore_fields=['prompt_caching'])
+async def _cached_acompletion(*args, prompt_caching=False, **kwargs):
+    """ `prompt_caching` only changes how the request is sent, not the response - so it's not part of the cache key """
+    if prompt_caching and _uses_cache_control(kwargs['model']):
+        messages, tools = _with_cache_control(kwargs['messages'], kwargs.get('tools'))
+        try:
+            return await _acompletion_with_retries(*args, **{**kwargs, "messages" : messages, **({"tools" : tools} if tools else {})})
+        except BadRequestError as e:
+            if not _is_cache_control_error(e):
+                raise # e.g. context window exceeded - nothing to do w/ caching
+            
+            rprint(f"[yellow]WARNING | _cached_acompletion: {kwargs['model']} rejected cache_control - sending w/o it ({e})[/yellow]")
+            _NO_CACHE_CONTROL.add(kwargs['model'])
+    
+    return await _acompletion_with_retries(*args, **kwargs)
 
 # --
 # Agent
 
 class ToolCallAgent:
-    def __init__(self, model_config, tools, special_instructions=None, do_double_check=False):
+    DOUBLE_CHECK_MODES = ["always", "gated", "never"]
+    
+    def __init__(self, model_config, tools, special_instructions=None, do_double_check=False, compaction=None, prefetch=None,
+                 tool_timeouts=None, default_tool_timeout=None, budget=None, double_check=None, double_check_gate=None,
+                 prompt_caching=True):
         self.model_config = model_config
         
         force_lowercase = model_config['model'] in ['gpt-4o', 'o3-mini']
-        self.toolbox    = ToolBox(tools, force_lowercase=force_lowercase)
+        self.toolbox    = ToolBox(tools, force_lowercase=force_lowercase, timeouts=tool_timeouts, default_timeout=default_tool_timeout)
         
         self.system_prompt_template = open(SYSTEM_PROMPT).read()
         self.special_instructions   = special_instructions
         self.double_check_prompt    = DOUBLE_CHECK_PROMPT
         
         self._acompletion           = _cached_acompletion
-        self.do_double_check        = do_double_check
+        self.double_check           = double_check or ("always" if do_double_check else "never") # `double_check` overrides `do_double_check`
+        self.double_check_gate      = double_check_gate if double_check_gate is not None else DoubleCheckGate()
+        if self.double_check not in self.DOUBLE_CHECK_MODES:
+            raise ValueError(f"Unknown double_check mode {self.double_check} - must be one of {self.DOUBLE_CHECK_MODES}")
+        self.compaction             = compaction if compaction is not None else Compaction()
+        self.prefetch               = prefetch # None, or `Prefetcher` kwargs
+        self.budget                 = budget if budget is not None else Budget()
+        self.prompt_caching         = prompt_caching # provider-side prefix caching (see `_with_cache_control`)
     
     def _get_system_prompt(self):
         SYSTEM_PROMPT = self.system_prompt_template.format( # TODO: add TOOLS
@@ -71,6 +163,19 @@ class ToolCallAgent:
 
     
     async def arun(self, query, max_iters=100, verbose=True):
+        prefetcher = Prefetcher(**self.prefetch) if self.prefetch is not None else None
+        try:
+            messages = await self._arun(query, max_iters=max_iters, verbose=verbose, prefetcher=prefetcher)
+        finally:
+            if prefetcher is not None:
+                await prefetcher.aclose()
+        
+        if prefetcher is not None:
+            messages[-1].setdefault('metrics', {})['prefetch'] = prefetcher.stats()
+        
+        return messages
+    
+    async def _arun(self, query, max_iters, verbose, prefetcher):
         console = Console()
         
         messages = [
@@ -83,17 +188,61 @@ class ToolCallAgent:
                 print_msg(msg, console=console)
 
         DOUBLE_CHECK_COMPLETED = False
+        t_start = perf_counter()
+        spent   = Counter() # {time, prompt_tokens, tool_calls, cost} - for `self.budget`
+        last    = Counter() # ... for the last turn only
         for _ in range(max_iters):
+            t_turn    = perf_counter()
+            exhausted = self.budget.exhausted({**spent, "time" : t_turn - t_start}, last)
+            if exhausted:
+                # out of budget - get an answer from what we have, w/o more tool calls
+                messages.append({
+                    "role"    : "user",
+                    "content" : self.budget.finalize_prompt(exhausted),
+                })
+                if verbose:
+                    print_msg(messages[-1], console=console)
+            
+            t    = perf_counter()
+            view = await self.compaction.acompact(messages, query=query, model_config=self.model_config)
+            compaction_time = perf_counter() - t
+            
+            t   = perf_counter()
             out = await self._acompletion(
                 **self.model_config,
-                messages = [_drop_bad_fields(m) for m in messages],
+                messages = [_drop_bad_fields(m) for m in view],
                 tools    = deepcopy(self.toolbox.sigs), # [LITELLM BUG] they change the list?  `OBJECT` -> `object`
+                **({"tool_choice" : "none"} if exhausted else {}),
+                prompt_caching = self.prompt_caching,
             )
             message = out.choices[0].message
+            metrics = _llm_metrics(out, perf_counter() - t, phase="finalize" if exhausted else "double_check" if DOUBLE_CHECK_COMPLETED else "main")
+            metrics['compaction_time'] = compaction_time
             
             if verbose:
                 print_msg(message, console=console)
             
+            if exhausted:
+                metrics['budget'] = {
+                    "exhausted" : exhausted,
+                    "limit"     : self.budget.limits[exhausted],
+                    "spent"     : {**spent, "time" : t_turn - t_start},
+                }
+                messages.append({
+                    "role"              : message.role,
+                    "content"           : message.content, # tool calls (if the provider ignored `tool_choice`) are dropped
+                    "reasoning_content" : message.reasoning_content if hasattr(message, 'reasoning_content') else None,
+                    "metrics"           : metrics,
+                })
+                break
+            
+            last = Counter({
+                "prompt_tokens" : metrics['prompt_tokens'] or 0,
+                "cost"          : metrics['cost'] or 0,
+                "tool_calls"    : len(message.tool_calls or []),
+            })
+            spent.update(last)
+            
             # --
             # Tool call
             
@@ -106,11 +255,14 @@ class ToolCallAgent:
                     "content"           : message.content,
                     "reasoning_content" : message.reasoning_content if hasattr(message, 'reasoning_content') else None,
                     "tool_calls"        : [tool_call.model_dump() for tool_call in message.tool_calls],
+                    "metrics"           : metrics,
                 })
                 
                 tool_result_msgs = await asyncio.gather(*[
-                    self.toolbox.arun(tool_call) for tool_call in message.tool_calls
+                    self.toolbox.arun(tool_call, prefetcher=prefetcher) for tool_call in message.tool_calls
                 ])
+                for tool_result_msg in tool_result_msgs:
+                    tool_result_msg['metrics']['phase'] = metrics['phase']
                 
                 if verbose:
                     for tool_result_msg in tool_result_msgs:
@@ -122,18 +274,27 @@ class ToolCallAgent:
                     "role"              : message.role,
                     "content"           : message.content,
                     "reasoning_content" : message.reasoning_content if hasattr(message, 'reasoning_content') else None,
+                    "metrics"           : metrics,
                 })
                 
-                if not self.do_double_check:
+                if self.double_check == "never":
                     break
                 elif DOUBLE_CHECK_COMPLETED:
                     break
-                else:
-                    DOUBLE_CHECK_COMPLETED = True
-                    messages.append({
-                        "role"    : "user",
-                        "content" : self.double_check_prompt,
-                    })
+                
+                if self.double_check == "gated":
+                    decision = await self.double_check_gate.adecide(query, messages)
+                    messages[-1]['metrics']['double_check'] = decision
+                    if not decision['needed']:
+                        break
+                
+                DOUBLE_CHECK_COMPLETED = True
+                messages.append({
+                    "role"    : "user",
+                    "content" : self.double_check_prompt,
+                })
+            
+            last['time'] = perf_counter() - t_turn
         
         if messages[-1]['content'] is None:
             rprint("[yellow]WARNING | ToolCallAgent: messages[-1]['content'] is None - rolling back[/yellow]")
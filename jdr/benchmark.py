@@ -3,36 +3,27 @@
     jdr.benchmark
 """
 
+import os
 import json
 import base64
 import asyncio
 import argparse
+from functools import partial
 import numpy as np
-import pandas as pd
 from time import time
 from hashlib import md5
 from pathlib import Path
-from datasets import load_dataset as hf_load_dataset
 from rich import print as rprint
 
-from jdr.agents import ToolCallAgent, JinaDeepsearchAgent, GoogleSearchAgent, SimpleAgent
-from jdr.tools import asearch_serp, asearch_serp_multi, ascrape_jina
-from jdr.evaluators import MultiEvaluator
-
-DATASET_CONFIGS = {
-    "frames" : {
-        "path"  : "Intelligent-Internet/frames-benchmark",
-        "split" : "benchmark",
-    },
-    "seal0" : {
-        "path"  : "vtllms/sealqa",
-        "name"  : "seal_0",
-        "split" : "test"
-    },
-    "simpleqa" : {
-        "path"   : "https://openaipublic.blob.core.windows.net/simple-evals/simple_qa_test_set.csv",
-    }
-}
+from jdr.agents import ToolCallAgent, JinaDeepsearchAgent, GoogleSearchAgent, SimpleAgent, Compaction, Budget, DoubleCheckGate
+from jdr.tools import asearch_serp, asearch_serp_multi, ascrape_jina, ascrape_outline, afind_in_page, aread_page_section, asearch_local, aclose_clients, http_stats
+from jdr.tools.local_index import set_indexing
+from jdr.evaluators import MultiEvaluator, EVALUATORS, simpleqa_evaluator
+from jdr.data import load_dataset, get_dataset
+from jdr.metrics import question_metrics, summarize, print_summary, load_results, tradeoff, print_tradeoffs
+from jdr.utils import set_cache_policy, parse_cache_policy, cache_stats, set_cache_mode, CacheMissError
+from jdr.ratelimit import set_rate_limit, ratelimit_stats
+from jdr.scheduler import AdaptiveConcurrency, astream
 
 MODEL_CONFIGS = {
     "gemini/gemini-2.5-flash-preview-05-20": {
@@ -41,6 +32,12 @@ MODEL_CONFIGS = {
     },
 }
 
+# item = (mid, query, target, evaluator, controller) -> sort key (lower starts first)
+ORDERS = {
+    "input"      : None,
+    "slow_first" : lambda item: -len(item[1]), # long, multi-part questions tend to take the most tool calls
+}
+
 def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("--agent",           type=str,            default="jdr-toolcall")
@@ -48,42 +45,115 @@ def parse_args():
     parser.add_argument("--dataset",         type=str,            default="frames")
     parser.add_argument("--sample",          type=int,            default=None)
     parser.add_argument("--seed",            type=int,            default=123)
-    parser.add_argument("--mid",             type=str,            default=None, nargs='+')
-    parser.add_argument("--no_double_check", action='store_true', default=False)
+    parser.add_argument("--mid",             type=str,            default=None, nargs='+', help="only run these question ids (md5 of the query)")
+    parser.add_argument("--shard",           type=str,            default=None, help="i/N - only run questions with int(mid, 16) % N == i (see `jdr.shards`)")
+    parser.add_argument("--outdir",          type=str,            default=None, help="default: ./results/<dataset>/<agent>/<model_name>")
+    parser.add_argument("--outdir_file",     type=str,            default=None, help="write the resolved outdir to this file (used by `jdr.shards launch`)")
+    parser.add_argument("--order",           type=str,            default="input", choices=ORDERS.keys(), help="order questions are started in")
+    parser.add_argument("--resume",          action='store_true', default=False, help="skip questions that already have a result in outdir")
+    parser.add_argument("--no_double_check", action='store_true', default=False, help="same as `--double_check never`")
+    parser.add_argument("--double_check",    type=str,            default=None, choices=ToolCallAgent.DOUBLE_CHECK_MODES, help="re-check the first answer: always (default), gated (only when it looks poorly sourced) or never (jdr-toolcall)")
+    parser.add_argument("--double_check_verifier", type=str,      default=None, help="gated: also check well-sourced answers against their citations w/ this (small) litellm model")
+    parser.add_argument("--search_ttl",      type=float,          default=None, help="expire cached search results after N seconds (e.g. for time-sensitive datasets like seal0)")
+    parser.add_argument("--cache_policy",    type=str,            default=[], nargs='+', help="per-namespace cache bounds, e.g. scrape/jina:max_bytes=2e10,eviction=lfu completion:max_entries=1e6 (see JDR_CACHE_POLICY)")
+    parser.add_argument("--min_concurrency", "--min-concurrency", type=int, default=None, help="lower bound for adaptive concurrency (default: agent's n_concurrent)")
+    parser.add_argument("--max_concurrency", "--max-concurrency", type=int, default=None, help="upper bound for adaptive concurrency (default: agent's n_concurrent)")
+    parser.add_argument("--rate_limit",      type=str,            default=[], nargs='+', help="per-provider requests/sec, e.g. serpapi=5 jina=10 gemini/gemini-2.5-flash-preview-05-20=2")
+    parser.add_argument("--compaction",      type=str,            default="none", choices=Compaction.METHODS, help="how to shrink old tool results sent to the LLM (jdr-toolcall)")
+    parser.add_argument("--compaction_keep_last", type=int,       default=2, help="tool results from the last N assistant turns are never compacted")
+    parser.add_argument("--max_prompt_tokens", type=int,          default=None, help="hard (estimated) prompt token budget per LLM request")
+    parser.add_argument("--page_tools",      action='store_true', default=False, help="replace `ascrape_jina` w/ outline + in-page search / read tools (jdr-toolcall)")
+    parser.add_argument("--local_search",    action='store_true', default=False, help="add `asearch_local` (BM25 over previously scraped pages) to the tools (jdr-toolcall)")
+    parser.add_argument("--prefetch",        type=int,            default=0, help="scrape the top-k results of each search in the background (jdr-toolcall, 0 = off)")
+    parser.add_argument("--prefetch_budget", type=int,            default=10, help="max prefetched pages per question")
+    parser.add_argument("--tool_timeout",    type=str,            default=[], nargs='+', help="per-tool deadlines in seconds, e.g. `120` (every tool) or `ascrape_jina=120 asearch_serp=30`")
+    parser.add_argument("--no_prompt_caching", action='store_true', default=False, help="don't add `cache_control` breakpoints for providers that need them (jdr-toolcall)")
+    parser.add_argument("--budget_time",     type=float,          default=None, help="per-question wall-clock budget in seconds - the agent is asked for its final answer before it runs out (jdr-toolcall)")
+    parser.add_argument("--budget_prompt_tokens", type=int,       default=None, help="per-question budget of prompt tokens, summed over LLM requests")
+    parser.add_argument("--budget_tool_calls", type=int,          default=None, help="per-question budget of tool calls")
+    parser.add_argument("--budget_cost",     type=float,          default=None, help="per-question budget in dollars")
+    parser.add_argument("--replay",          action='store_true', default=False, help="only use cached LLM / tool / grader calls - abort on the first cache miss (same as JDR_CACHE_MODE=replay)")
+    parser.add_argument("--fake",            action='store_true', default=False, help="use local fake SerpAPI / Jina / LLM (`jdr.fakes`) - requires JDR_CACHE_ROOT")
     args = parser.parse_args()
     
-    args.outdir = Path('./results') / args.dataset / args.agent / args.model_name
+    if args.fake:
+        if not os.environ.get("JDR_CACHE_ROOT"):
+            parser.error("--fake requires JDR_CACHE_ROOT to be set, so fake responses never end up in the real cache")
+        args.model_name = "fake"
+    
+    args.compaction = Compaction(args.compaction, keep_last=args.compaction_keep_last, max_prompt_tokens=args.max_prompt_tokens)
+    if args.double_check is None:
+        args.double_check = "never" if args.no_double_check else "always"
+    elif args.no_double_check and args.double_check != "never":
+        parser.error("--no_double_check conflicts w/ --double_check " + args.double_check)
+    
+    args.budget     = Budget(max_time=args.budget_time, max_prompt_tokens=args.budget_prompt_tokens, max_tool_calls=args.budget_tool_calls, max_cost=args.budget_cost)
+    
+    if args.outdir is None:
+        args.outdir = Path('./results') / args.dataset / args.agent / args.model_name
+        if args.compaction.enabled:
+            # keep variants apart, so they can be compared w/ `jdr.metrics` / `jdr.shards merge`
+            args.outdir = args.outdir.with_name(f"{args.outdir.name}+compaction={args.compaction.name}")
+        if args.double_check != "always":
+            args.outdir = args.outdir.with_name(f"{args.outdir.name}+double_check={args.double_check}")
+        if args.budget.enabled:
+            args.outdir = args.outdir.with_name(f"{args.outdir.name}+budget={args.budget.name}")
+        if args.page_tools:
+            args.outdir = args.outdir.with_name(f"{args.outdir.name}+page_tools")
+        if args.local_search:
+            args.outdir = args.outdir.with_name(f"{args.outdir.name}+local_search")
+    else:
+        args.outdir = Path(args.outdir)
+    
     args.outdir.mkdir(parents=True, exist_ok=True)
-    args.do_double_check = not args.no_double_check
+    if args.outdir_file is not None:
+        with open(args.outdir_file, "w") as f:
+            f.write(str(args.outdir))
+    
+    args.tool_timeouts, args.default_tool_timeout = {}, None
+    for tool_timeout in args.tool_timeout:
+        if '=' in tool_timeout:
+            tool_name, seconds = tool_timeout.rsplit('=', 1)
+            args.tool_timeouts[tool_name] = float(seconds)
+        else:
+            args.default_tool_timeout = float(tool_timeout)
+    
+    if args.shard is not None:
+        args.shard_idx, args.n_shards = [int(x) for x in args.shard.split('/')]
+        assert 0 <= args.shard_idx < args.n_shards, f"invalid --shard {args.shard}"
 
     return args
 
 args = parse_args()
 np.random.seed(args.seed)
 
-# --
-# IO
+for rate_limit in args.rate_limit:
+    provider, rate = rate_limit.rsplit('=', 1)
+    set_rate_limit(provider, float(rate))
 
-if args.dataset == "frames":
-    ds = hf_load_dataset(**DATASET_CONFIGS[args.dataset]).to_pandas()
-    queries = ds.prompt.to_list()
-    targets = ds.answer.to_list()
-    special_instructions = "You are only allowed to use Wikipedia as a source of information.  You can prefix your query with `site:wikipedia.org` to search only Wikipedia. Remember to actually visit the webpages using `ascrape_jina`."
+if args.replay:
+    set_cache_mode("replay")
 
-elif args.dataset == "seal0":
-    ds = hf_load_dataset(**DATASET_CONFIGS[args.dataset]).to_pandas()
-    queries = ds.question.tolist()
-    targets = ds.answer.tolist()
-    special_instructions = "Today's date is June 23, 2025. You strongly prefer using Wikipedia as your source of information.  If you can't completely answer the question using Wikipedia, you're welcome to visit other sites.  Remember to actually visit the webpages using `ascrape_jina`."
+fake_server = None
+if args.fake:
+    from jdr.fakes import start_fake_server
+    fake_server           = start_fake_server()
+    MODEL_CONFIGS["fake"] = fake_server.model_config
+    EVALUATORS["fake"]    = partial(simpleqa_evaluator, model=fake_server.model_config['model'], extra_params={k:v for k, v in fake_server.model_config.items() if k != 'model'})
 
-elif args.dataset == "simpleqa":
-    df      = pd.read_csv(DATASET_CONFIGS[args.dataset]['path'])
-    queries = df.problem.tolist()
-    targets = df.answer.tolist()
-    special_instructions = "Today's date is June 23, 2025. You strongly prefer using Wikipedia as your source of information.  If you can't completely answer the question using Wikipedia, you're welcome to visit other sites.  Remember to actually visit the webpages using `ascrape_jina`."
+for spec in args.cache_policy:
+    cache_dir, policy = parse_cache_policy(spec)
+    set_cache_policy(cache_dir, **policy)
 
-else:
-    raise ValueError(f"Dataset {args.dataset} not supported")
+if args.search_ttl is not None:
+    set_cache_policy("./.cache/search/serp", ttl=args.search_ttl)
+    set_cache_policy("./.cache/search/serp_multi", ttl=args.search_ttl)
+
+# --
+# IO
+
+queries, targets     = load_dataset(args.dataset)
+special_instructions = get_dataset(args.dataset)['special_instructions']
 
 # sample
 if args.sample is not None:
@@ -91,20 +161,85 @@ if args.sample is not None:
     queries = [queries[i] for i in p]
     targets = [targets[i] for i in p]
 
+# --
+# Select questions
+
+def _index_outdir(outdir):
+    """ mid -> grades, for every complete result in outdir (unreadable / partial files count as missing) """
+    completed = {}
+    for path in outdir.glob("*.json"):
+        if path.name == "report.json": # written by `jdr.shards merge`
+            continue
+        
+        try:
+            with open(path) as f:
+                result = json.load(f)
+            completed[result['mid']] = result['grades']
+        except Exception as e:
+            rprint(f"[yellow]WARNING | _index_outdir: ignoring {path} - {e}[/yellow]")
+    
+    return completed
+
+mids = [md5(query.encode()).hexdigest() for query in queries]
+
+keep = list(range(len(queries)))
+if args.mid is not None:
+    only = set(args.mid)
+    keep = [i for i in keep if mids[i] in only]
+
+if args.shard is not None:
+    # partition on the question id, so shards are stable across --sample / --seed / dataset order
+    keep = [i for i in keep if int(mids[i], 16) % args.n_shards == args.shard_idx]
+    rprint(f"[green]--shard {args.shard}: {len(keep)} questions[/green]")
+
+completed = {}
+if args.resume:
+    completed = _index_outdir(args.outdir)
+    kept      = set(mids[i] for i in keep)
+    completed = {mid:grades for mid, grades in completed.items() if mid in kept}
+    keep      = [i for i in keep if mids[i] not in completed]
+    rprint(f"[green]--resume: {len(completed)} already completed, {len(keep)} to run[/green]")
+
+queries = [queries[i] for i in keep]
+targets = [targets[i] for i in keep]
+mids    = [mids[i] for i in keep]
+
 # --
 # Definte agent
 
 if args.agent == "jdr-toolcall":
     n_concurrent = 8
+    tools        = {
+        "asearch_serp"       : asearch_serp,
+        "asearch_serp_multi" : asearch_serp_multi,
+        "ascrape_jina"       : ascrape_jina,
+    }
+    if args.page_tools:
+        del tools["ascrape_jina"]
+        tools.update({
+            "ascrape_outline"    : ascrape_outline,
+            "afind_in_page"      : afind_in_page,
+            "aread_page_section" : aread_page_section,
+        })
+        if special_instructions:
+            special_instructions = special_instructions.replace("`ascrape_jina`", "`ascrape_outline` + `afind_in_page` / `aread_page_section`")
+    
+    if args.local_search:
+        tools["asearch_local"] = asearch_local
+        set_indexing(True)
+    
     agent = ToolCallAgent(
         model_config = MODEL_CONFIGS[args.model_name], 
-        tools        = {
-            "asearch_serp"       : asearch_serp,
-            "asearch_serp_multi" : asearch_serp_multi,
-            "ascrape_jina"       : ascrape_jina,
-        },
+        tools        = tools,
         special_instructions     = special_instructions,
-        do_double_check          = args.do_double_check
+        double_check             = args.double_check,
+        double_check_gate        = DoubleCheckGate(verifier_model_config=MODEL_CONFIGS.get(args.double_check_verifier, {"model" : args.double_check_verifier}) if args.double_check_verifier else None),
+        compaction               = args.compaction,
+        prefetch                 = {"top_k" : args.prefetch, "budget" : args.prefetch_budget} if args.prefetch > 0 else None,
+        tool_timeouts            = args.tool_timeouts,
+        default_tool_timeout     = args.default_tool_timeout,
+        budget                   = args.budget,
+        prompt_caching           = not args.no_prompt_caching,
     ) 
 elif args.agent == "jina-deepsearch":
     n_concurrent = 16
@@ -121,47 +256,85 @@ else:
 # --
 # Run
 
-semaphore = asyncio.Semaphore(n_concurrent)
-async def _run_one(query, target, evaluator):
-    async with semaphore:
-        t   = time()
-        mid = md5(query.encode()).hexdigest()
-        
-        try:
-            trace  = await agent.arun(query=query, verbose=False)
-            grades = await evaluator.arun(query=query, target=target, response=trace[-1]['content'])
-        except Exception as e:
-            print(f'ERROR @ _run_one: {e}')
-            return None
-        
-        elapsed = time() - t
-        return {
-            "mid"     : mid,
-            "query"   : query,
-            "target"  : target,
-            "elapsed" : elapsed,
-            "trace"   : trace,
-            "grades"  : grades,
-        }
+async def _run_one(mid, query, target, evaluator, controller):
+    await controller.acquire()
+    t = time()
+    
+    try:
+        trace  = await agent.arun(query=query, verbose=False)
+        grades = await evaluator.arun(query=query, target=target, response=trace[-1]['content'])
+    except CacheMissError:
+        await controller.release(ok=False)
+        raise
+    except Exception as e:
+        print(f'ERROR @ _run_one: {e}')
+        await controller.release(ok=False)
+        return None
+    
+    await controller.release(ok=True)
+    elapsed = time() - t
+    return {
+        "mid"     : mid,
+        "query"   : query,
+        "target"  : target,
+        "elapsed" : elapsed,
+        "trace"   : trace,
+        "grades"  : grades,
+        "metrics" : question_metrics(trace, elapsed=elapsed),
+    }
 
 
 async def _run_all():
-    evaluator = MultiEvaluator()
-    tasks     = [_run_one(query, target, evaluator) for query, target in zip(queries, targets)]
+    evaluator = MultiEvaluator(evaluators=["fake"] if args.fake else None)
+    for grades in completed.values():
+        evaluator.update(grades)
+    
+    controller = AdaptiveConcurrency(
+        initial         = n_concurrent,
+        min_concurrency = args.min_concurrency or n_concurrent,
+        max_concurrency = args.max_concurrency or max(n_concurrent, args.min_concurrency or 0),
+    )
+    controller.start()
     
     n_errors = 0
-    for result in asyncio.as_completed(tasks):
-        result = await result
+    metrics  = []
+    def _on_result(item, result):
+        nonlocal n_errors
         if result is None:
             n_errors += 1
             rprint(f'[red]n_errors={n_errors}[/red]')
-            continue
+            return
         
-        with open(args.outdir / f"{result['mid']}.json", "w") as f:
+        metrics.append(result['metrics'])
+        
+        # write + rename, so a crash mid-write never leaves a partial result for --resume to trust
+        tmp_path = args.outdir / f"{result['mid']}.json.tmp"
+        with open(tmp_path, "w") as f:
             json.dump(result, f)
+        os.replace(tmp_path, args.outdir / f"{result['mid']}.json")
+    
+    # one worker per slot the controller could ever hand out - the controller decides how many actually run
+    items = [(mid, query, target, evaluator, controller) for mid, query, target in zip(mids, queries, targets)]
+    await astream(items, _run_one, _on_result, n_workers=controller.max_concurrency, priority=ORDERS[args.order])
     
     if n_errors > 0:
         rprint(f'[red]n_errors={n_errors}[/red]')
+    
+    await controller.stop()
+    if metrics:
+        print_summary(summarize(metrics), title="per-question metrics")
+        print_tradeoffs({args.outdir.name : tradeoff(load_results(args.outdir))}) # includes --resume'd questions
+    rprint(cache_stats(with_storage=False))
+    rprint(http_stats())
+    rprint(ratelimit_stats())
+    if fake_server is not None:
+        rprint(fake_server.stats())
+    await aclose_clients()
 
-asyncio.run(_run_all())
+try:
+    asyncio.run(_run_all())
+except CacheMissError as e:
+    rprint(f"[red]ERROR | replay: cache miss in {e.cache_dir} - key={e.cache_key}[/red]")
+    rprint(f"[red]        {e.description}[/red]")
+    raise SystemExit(1)
 
@@ -0,0 +1,805 @@
+#!/usr/bin/env python
+"""
+    jdr.cache
+
+    Storage backends for `jdr.utils.disk_cache`
+"""
+
+import os
+import sys
+import time
+import pickle
+import sqlite3
+import tempfile
+import threading
+from glob import glob
+from collections import OrderedDict
+from rich import print as rprint
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_BACKEND = os.environ.get("JDR_CACHE_BACKEND", "sqlite")
+LEGACY_MARKER   = "legacy-keys" # namespace may hold entries under pre-v2 (md5 of `str(params)`) keys
+
+# set by `jdr.utils.set_cache_mode` - in readonly / replay mode, reads must not write either (no legacy imports,
+# no access-time bookkeeping)
+READ_ONLY = False
+
+def set_read_only(read_only):
+    global READ_ONLY
+    READ_ONLY = read_only
+
+# --
+# Policy
+
+class CachePolicy:
+    """
+        Per-namespace retention policy
+        
+        max_bytes   : evict once the namespace holds more than this many (stored) bytes
+        max_entries : evict once the namespace holds more than this many entries
+        ttl         : entries older than `ttl` seconds are treated as misses and eventually deleted
+        eviction    : "lru" (least recently read) or "lfu" (least frequently read)
+    """
+    
+    def __init__(self, max_bytes=None, max_entries=None, ttl=None, eviction="lru"):
+        if eviction not in ["lru", "lfu"]:
+            raise ValueError(f"Unknown eviction {eviction} - must be one of ['lru', 'lfu']")
+        
+        self.max_bytes   = max_bytes
+        self.max_entries = max_entries
+        self.ttl         = ttl
+        self.eviction    = eviction
+    
+    def is_expired(self, created):
+        return self.ttl is not None and created < time.time() - self.ttl
+    
+    def __repr__(self):
+        return f"CachePolicy(max_bytes={self.max_bytes}, max_entries={self.max_entries}, ttl={self.ttl}, eviction={self.eviction})"
+
+# --
+# Backends
+
+def has_pickles(cache_dir):
+    """ does `cache_dir` hold any legacy `<key>.pkl` entries?  stops at the first one """
+    try:
+        with os.scandir(cache_dir) as it:
+            return any(entry.name.endswith('.pkl') for entry in it)
+    except FileNotFoundError:
+        return False
+
+class PickleDirBackend:
+    """ legacy layout - one `<key>.pkl` file per entry in a flat directory """
+
+    def __init__(self, cache_dir, policy=None):
+        self.cache_dir = cache_dir
+        self.policy    = policy or CachePolicy()
+        self.n_evicted = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key):
+        """ -> (value, created) or None """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+                st    = os.fstat(f.fileno())
+        except FileNotFoundError:
+            return None
+        
+        if self.policy.is_expired(st.st_mtime):
+            return None
+        
+        # mtime = created, atime = last read (set explicitly - many filesystems are mounted noatime)
+        if not READ_ONLY:
+            os.utime(path, (time.time(), st.st_mtime))
+        return value, st.st_mtime
+
+    def set(self, key, value, created=None):
+        # write to a temp file + rename, so a crash can never leave a half-written pickle behind
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            if created is not None:
+                os.utime(tmp_path, (time.time(), created))
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def set_many(self, items):
+        for key, value, *created in items:
+            self.set(key, value, created=created[0] if created else None)
+
+    def peek(self, key):
+        """ raw read - no ttl check, no access-time update """
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def replace_values(self, items):
+        """ rewrite existing entries' values in place, keeping their created / accessed times """
+        for key, value in items:
+            try:
+                st = os.stat(self._path(key))
+            except FileNotFoundError:
+                continue
+            self.set(key, value, created=st.st_mtime)
+            os.utime(self._path(key), (st.st_atime, st.st_mtime))
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def keys(self):
+        return [f[:-4] for f in os.listdir(self.cache_dir) if f.endswith('.pkl')]
+    
+    def _entries(self):
+        return [(e.name[:-4], e.stat()) for e in os.scandir(self.cache_dir) if e.name.endswith('.pkl')]
+    
+    def evict(self, batch_size=256):
+        """ one incremental eviction pass - lfu is not tracked by this backend, so it falls back to lru """
+        policy  = self.policy
+        entries = self._entries()
+        
+        victims = []
+        if policy.ttl is not None:
+            victims += [key for key, st in entries if policy.is_expired(st.st_mtime)]
+        
+        victims = set(victims[:batch_size])
+        entries = sorted([(st.st_atime, key, st.st_size) for key, st in entries if key not in victims])
+        n_bytes = sum(size for _, _, size in entries)
+        n_lru   = 0 # `entries` already excludes the expired victims
+        for _, key, size in entries:
+            if len(victims) >= batch_size:
+                break
+            
+            over_entries = policy.max_entries is not None and len(entries) - n_lru > policy.max_entries
+            over_bytes   = policy.max_bytes is not None and n_bytes > policy.max_bytes
+            if not (over_entries or over_bytes):
+                break
+            
+            victims.add(key)
+            n_lru   += 1
+            n_bytes -= size
+        
+        for key in victims:
+            self.delete(key)
+        
+        self.n_evicted += len(victims)
+        return len(victims)
+    
+    def stats(self):
+        entries = self._entries()
+        return {
+            "n_entries" : len(entries),
+            "n_bytes"   : sum(st.st_size for _, st in entries),
+            "n_evicted" : self.n_evicted,
+        }
+
+
+class SQLiteBackend:
+    """
+        Single-file store (per namespace, optionally sharded) in SQLite WAL mode.
+
+        - writes are single-statement transactions, so readers never see a partial value
+        - WAL lets any number of processes read while one writes
+        - connections are per-thread, so the backend can be used from worker threads
+        - on a miss, falls back to (and imports) a legacy `<key>.pkl` in the same directory - only if the
+          directory held any `.pkl` files when the backend was opened, so plain sqlite namespaces never stat
+        - reads are recorded in memory and written back in batches, so lookups don't turn into writes
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cache (
+            key      TEXT PRIMARY KEY,
+            value    BLOB NOT NULL,
+            size     INTEGER NOT NULL,
+            created  REAL NOT NULL,
+            accessed REAL NOT NULL DEFAULT 0,
+            hits     INTEGER NOT NULL DEFAULT 0
+        )
+    """
+    
+    INDEXES = [
+        "CREATE INDEX IF NOT EXISTS cache_created ON cache (created)",
+        "CREATE INDEX IF NOT EXISTS cache_lru ON cache (accessed)",
+        "CREATE INDEX IF NOT EXISTS cache_lfu ON cache (hits, accessed)",
+    ]
+    
+    FLUSH_EVERY = 256
+
+    def __init__(self, cache_dir, n_shards=1, timeout=60, legacy_fallback=True, policy=None):
+        self.cache_dir       = cache_dir
+        self.n_shards        = n_shards
+        self.timeout         = timeout
+        self.legacy_fallback = legacy_fallback and has_pickles(cache_dir)
+        self.policy          = policy or CachePolicy()
+        
+        self.n_evicted       = 0
+        self.n_expired       = 0
+        self._touched        = {} # key -> (last access, n reads) not yet written back
+        self._touch_lock     = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        if n_shards == 1:
+            self.paths = [os.path.join(cache_dir, "cache.sqlite")]
+        else:
+            self.paths = [os.path.join(cache_dir, f"cache-{i:02d}.sqlite") for i in range(n_shards)]
+
+        self._local = threading.local()
+        for shard in range(n_shards):
+            conn = self._conn(shard)
+            conn.execute(self.SCHEMA)
+            
+            # caches created before access tracking
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(cache)")]
+            if "accessed" not in columns:
+                conn.execute("ALTER TABLE cache ADD COLUMN accessed REAL NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE cache ADD COLUMN hits INTEGER NOT NULL DEFAULT 0")
+                conn.execute("UPDATE cache SET accessed = created")
+            
+            for index in self.INDEXES:
+                conn.execute(index)
+
+    def _conn(self, shard):
+        conns = getattr(self._local, 'conns', None)
+        if conns is None:
+            conns = self._local.conns = {}
+
+        if shard not in conns:
+            conn = sqlite3.connect(self.paths[shard], timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conns[shard] = conn
+
+        return conns[shard]
+
+    def _shard(self, key):
+        return int(key[:8], 16) % self.n_shards if self.n_shards > 1 else 0
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key):
+        """ -> (value, created) or None """
+        row = self._conn(self._shard(key)).execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            value, created = row
+            if self.policy.is_expired(created):
+                return None
+            
+            if not READ_ONLY:
+                self._touch(key)
+            return value, created
+
+        if self.legacy_fallback:
+            legacy_path = os.path.join(self.cache_dir, f"{key}.pkl")
+            if os.path.exists(legacy_path):
+                with open(legacy_path, 'rb') as f:
+                    value = f.read()
+                created = os.path.getmtime(legacy_path)
+                if not READ_ONLY:
+                    self.set(key, value, created=created)
+                return value, created
+
+        return None
+
+    def set(self, key, value, created=None):
+        now = time.time()
+        self._conn(self._shard(key)).execute(
+            "INSERT OR REPLACE INTO cache (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value), created if created is not None else now, now)
+        )
+
+    def set_many(self, items):
+        """ items: (key, value) or (key, value, created) - e.g. imported entries keep their original age """
+        by_shard = {}
+        for key, value, *created in items:
+            now = time.time()
+            by_shard.setdefault(self._shard(key), []).append((key, value, len(value), created[0] if created else now, now))
+
+        for shard, rows in by_shard.items():
+            conn = self._conn(shard)
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany("INSERT OR REPLACE INTO cache (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)", rows)
+    
+    def peek(self, key):
+        """ raw read - no ttl check, no access / hit bookkeeping """
+        row = self._conn(self._shard(key)).execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def replace_values(self, items):
+        """ rewrite existing entries' values in place, keeping created / accessed / hits (e.g. recompression) """
+        by_shard = {}
+        for key, value in items:
+            by_shard.setdefault(self._shard(key), []).append((value, len(value), key))
+
+        for shard, rows in by_shard.items():
+            conn = self._conn(shard)
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany("UPDATE cache SET value = ?, size = ? WHERE key = ?", rows)
+    
+    def _touch(self, key):
+        with self._touch_lock:
+            _, n = self._touched.get(key, (None, 0))
+            self._touched[key] = (time.time(), n + 1)
+            do_flush = len(self._touched) >= self.FLUSH_EVERY
+        
+        if do_flush:
+            self.flush()
+    
+    def flush(self):
+        """ write buffered access times / hit counts back to the store """
+        with self._touch_lock:
+            touched, self._touched = self._touched, {}
+        
+        by_shard = {}
+        for key, (accessed, n) in touched.items():
+            by_shard.setdefault(self._shard(key), []).append((accessed, n, key))
+        
+        for shard, rows in by_shard.items():
+            conn = self._conn(shard)
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany("UPDATE cache SET accessed = ?, hits = hits + ? WHERE key = ?", rows)
+
+    def delete(self, key):
+        self._conn(self._shard(key)).execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def keys(self):
+        out = []
+        for shard in range(self.n_shards):
+            out += [row[0] for row in self._conn(shard).execute("SELECT key FROM cache")]
+        return out
+    
+    def evict(self, batch_size=256):
+        """ one incremental eviction pass - deletes at most `batch_size` entries per shard """
+        policy = self.policy
+        self.flush()
+        
+        n_deleted = 0
+        for shard in range(self.n_shards):
+            conn = self._conn(shard)
+            
+            if policy.ttl is not None:
+                cur = conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache WHERE created < ? LIMIT ?)",
+                    (time.time() - policy.ttl, batch_size)
+                )
+                self.n_expired += cur.rowcount
+                n_deleted      += cur.rowcount
+            
+            if policy.max_entries is None and policy.max_bytes is None:
+                continue
+            
+            max_entries = policy.max_entries // self.n_shards if policy.max_entries is not None else None
+            max_bytes   = policy.max_bytes // self.n_shards if policy.max_bytes is not None else None
+            
+            n_entries, n_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+            
+            order   = "accessed" if policy.eviction == "lru" else "hits, accessed"
+            victims = []
+            for key, size in conn.execute(f"SELECT key, size FROM cache ORDER BY {order} LIMIT ?", (batch_size,)).fetchall():
+                over_entries = max_entries is not None and n_entries > max_entries
+                over_bytes   = max_bytes is not None and n_bytes > max_bytes
+                if not (over_entries or over_bytes):
+                    break
+                
+                victims.append((key,))
+                n_entries -= 1
+                n_bytes   -= size
+            
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+            
+            self.n_evicted += len(victims)
+            n_deleted      += len(victims)
+        
+        return n_deleted
+    
+    def stats(self):
+        n_entries, n_bytes = 0, 0
+        for shard in range(self.n_shards):
+            _n_entries, _n_bytes = self._conn(shard).execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+            n_entries += _n_entries
+            n_bytes   += _n_bytes
+        
+        return {
+            "n_entries" : n_entries,
+            "n_bytes"   : n_bytes,
+            "n_evicted" : self.n_evicted,
+            "n_expired" : self.n_expired,
+        }
+
+
+# --
+# Memory tier
+
+class MemoryTier:
+    """
+        Byte-bounded LRU of *serialized* entries, consulted before the backend.
+        
+        Values stay pickled because callers mutate what they get back (e.g. `ToolCallAgent` deletes 
+        `provider_specific_fields` from cached completions) - a hit still skips the filesystem, but each 
+        caller gets a fresh object.
+    """
+    
+    def __init__(self, max_bytes):
+        self.max_bytes   = max_bytes
+        self.n_bytes     = 0
+        self.n_hits      = 0
+        self.n_misses    = 0
+        self.n_evicted   = 0
+        self._data       = OrderedDict() # key -> (value, created)
+        self._lock       = threading.Lock()
+    
+    def get(self, key, ttl=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and ttl is not None and entry[1] < time.time() - ttl:
+                self._pop(key)
+                entry = None
+            
+            if entry is None:
+                self.n_misses += 1
+                return None
+            
+            self._data.move_to_end(key)
+            self.n_hits += 1
+            return entry[0]
+    
+    def set(self, key, value, created=None):
+        """ created: when the entry was written to the backend (default: now) - ttl is measured from then """
+        if len(value) > self.max_bytes:
+            return
+        
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            
+            self._data[key] = (value, created if created is not None else time.time())
+            self.n_bytes   += len(value)
+            while self.n_bytes > self.max_bytes:
+                self._pop(next(iter(self._data)))
+                self.n_evicted += 1
+    
+    def _pop(self, key):
+        value, _ = self._data.pop(key)
+        self.n_bytes -= len(value)
+    
+    def stats(self):
+        return {
+            "memory_hits"      : self.n_hits,
+            "memory_misses"    : self.n_misses,
+            "memory_entries"   : len(self._data),
+            "memory_bytes"     : self.n_bytes,
+            "memory_max_bytes" : self.max_bytes,
+            "memory_evicted"   : self.n_evicted,
+        }
+
+# --
+# Compression
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+class Codec:
+    """
+        Transparent (de)compression of stored values.
+        
+        Compressed values are zstd frames, which are recognized by their magic bytes - so namespaces can mix 
+        compressed and legacy uncompressed (raw pickle) entries, and turning compression on/off needs no migration.
+        
+        Trained dictionaries live next to the data as `zstd-<dict_id>.dict`.  New entries use the newest one; 
+        old ones stay readable because every frame records the id of the dictionary it was compressed with.
+    """
+    
+    def __init__(self, cache_dir, compress=None, level=3):
+        if compress not in [None, "zstd"]:
+            raise ValueError(f"Unknown compression {compress} - must be one of [None, 'zstd']")
+        
+        if compress == "zstd" and zstandard is None:
+            raise ImportError("Codec: compress='zstd' requires the `zstandard` package")
+        
+        self.cache_dir = cache_dir
+        self.compress  = compress
+        self.level     = level
+        self.load_dicts()
+    
+    def load_dicts(self):
+        self.dicts   = {}
+        self.dict_id = 0
+        self._local  = threading.local() # zstd (de)compressors are not thread-safe
+        if zstandard is None:
+            return
+        
+        for path in sorted(glob(os.path.join(self.cache_dir, "zstd-*.dict")), key=os.path.getmtime):
+            with open(path, 'rb') as f:
+                d = zstandard.ZstdCompressionDict(f.read())
+            self.dicts[d.dict_id()] = d
+            self.dict_id = d.dict_id()
+    
+    def _compressor(self):
+        if not hasattr(self._local, 'compressor'):
+            self._local.compressor = zstandard.ZstdCompressor(level=self.level, dict_data=self.dicts.get(self.dict_id))
+        return self._local.compressor
+    
+    def _decompressor(self, dict_id):
+        if dict_id != 0 and dict_id not in self.dicts:
+            self.load_dicts() # trained by another process since we started
+        
+        decompressors = self._local.__dict__.setdefault('decompressors', {})
+        if dict_id not in decompressors:
+            decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=self.dicts.get(dict_id))
+        return decompressors[dict_id]
+    
+    def encode(self, value):
+        if self.compress is None:
+            return value
+        
+        return self._compressor().compress(value)
+    
+    def decode(self, value):
+        if value[:4] != ZSTD_MAGIC:
+            return value
+        
+        if zstandard is None:
+            raise ImportError("Codec: found zstd-compressed entry, but `zstandard` is not installed")
+        
+        dict_id = zstandard.get_frame_parameters(value).dict_id
+        return self._decompressor(dict_id).decompress(value)
+
+
+def train_dict(cache_dir, store=None, dict_size=112_640, n_samples=2_000):
+    """ train a zstd dictionary on (a sample of) the entries in a namespace, and save it as the namespace's newest dictionary """
+    if zstandard is None:
+        raise ImportError("train_dict: requires the `zstandard` package")
+    
+    if store is None:
+        store = get_backend(cache_dir)
+    
+    codec   = Codec(cache_dir)
+    keys    = store.keys()[:n_samples]
+    samples = [store.peek(key) for key in keys]
+    samples = [codec.decode(x) for x in samples if x is not None]
+    
+    d    = zstandard.train_dictionary(dict_size, samples)
+    path = os.path.join(cache_dir, f"zstd-{d.dict_id()}.dict")
+    with open(path, 'wb') as f:
+        f.write(d.as_bytes())
+    
+    return path
+
+
+def recompress(cache_dir, codec, store=None, batch_size=256):
+    """ re-encode every entry in a namespace with `codec` (e.g. after turning compression on, or training a new dictionary) """
+    if store is None:
+        store = get_backend(cache_dir)
+    
+    # peek + replace_values, so entries keep their age (ttl) and access history (lru / lfu)
+    n_before, n_after, batch = 0, 0, []
+    for key in store.keys():
+        value = store.peek(key)
+        if value is None:
+            continue
+        
+        new_value = codec.encode(codec.decode(value))
+        n_before += len(value)
+        n_after  += len(new_value)
+        batch.append((key, new_value))
+        if len(batch) >= batch_size:
+            store.replace_values(batch)
+            batch = []
+    
+    if batch:
+        store.replace_values(batch)
+    
+    return {"cache_dir" : cache_dir, "n_bytes_before" : n_before, "n_bytes_after" : n_after}
+
+
+def bench_codecs(cache_dir, n_samples=500, levels=(3, 9), dict_size=112_640):
+    """ disk footprint vs. load latency (decompress + unpickle) for each codec, on a sample of real entries """
+    import numpy as np
+    
+    store   = get_backend(cache_dir)
+    raw     = [Codec(cache_dir).decode(store.peek(key)) for key in store.keys()[:2 * n_samples]]
+    train   = raw[0::2]
+    samples = raw[1::2] # evaluate on entries the dictionary wasn't trained on
+    
+    variants = [("none", None, None)]
+    if zstandard is not None:
+        try:
+            d = zstandard.train_dictionary(dict_size, train)
+        except Exception as e:
+            rprint(f"[yellow]WARNING | bench_codecs: could not train dictionary - {e}[/yellow]", file=sys.stderr)
+            d = None
+        
+        for level in levels:
+            variants.append((f"zstd-{level}", zstandard.ZstdCompressor(level=level), zstandard.ZstdDecompressor()))
+            if d is not None:
+                variants.append((f"zstd-{level}+dict", zstandard.ZstdCompressor(level=level, dict_data=d), zstandard.ZstdDecompressor(dict_data=d)))
+    
+    out = []
+    for name, cctx, dctx in variants:
+        encoded = [cctx.compress(x) if cctx else x for x in samples]
+        
+        times = []
+        for x in encoded:
+            t = time.perf_counter()
+            pickle.loads(dctx.decompress(x) if dctx else x)
+            times.append(time.perf_counter() - t)
+        
+        out.append({
+            "codec"      : name,
+            "n_bytes"    : sum(len(x) for x in encoded),
+            "ratio"      : sum(len(x) for x in samples) / max(1, sum(len(x) for x in encoded)),
+            "load_p50_ms": 1000 * float(np.percentile(times, 50)),
+            "load_p95_ms": 1000 * float(np.percentile(times, 95)),
+        })
+    
+    return out
+
+
+BACKENDS = {
+    "sqlite" : SQLiteBackend,
+    "pickle" : PickleDirBackend,
+}
+
+_BACKEND_INSTANCES = {}
+
+def get_backend(cache_dir, backend=None):
+    """ one backend instance per (kind, cache_dir), so namespaces shared by several decorators share a store """
+    if backend is None:
+        backend = DEFAULT_BACKEND
+
+    if not isinstance(backend, str):
+        return backend
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown cache backend {backend} - must be one of {list(BACKENDS.keys())}")
+
+    k = (backend, os.path.abspath(cache_dir))
+    if k not in _BACKEND_INSTANCES:
+        _BACKEND_INSTANCES[k] = BACKENDS[backend](cache_dir)
+
+    return _BACKEND_INSTANCES[k]
+
+# --
+# Migration
+
+def mark_legacy(cache_dir):
+    """ tell `disk_cache` to also try pre-v2 keys on a miss in this namespace """
+    os.makedirs(cache_dir, exist_ok=True)
+    open(os.path.join(cache_dir, LEGACY_MARKER), 'a').close()
+
+def migrate_pickle_dir(cache_dir, store=None, delete=False, batch_size=256):
+    """ import every `<key>.pkl` in `cache_dir` into `store` (default: the sqlite backend for `cache_dir`) """
+    if store is None:
+        store = get_backend(cache_dir, "sqlite")
+
+    paths = [os.path.join(cache_dir, f) for f in os.listdir(cache_dir) if f.endswith('.pkl')]
+
+    n_ok, n_bad, batch = 0, 0, []
+    def _flush():
+        store.set_many(batch)
+        if delete:
+            for key, *_ in batch:
+                os.remove(os.path.join(cache_dir, f"{key}.pkl"))
+        batch.clear()
+
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                value   = f.read()
+                created = os.fstat(f.fileno()).st_mtime # keep the entry's age, so ttls still apply
+            pickle.loads(value) # skip truncated / corrupt files
+        except Exception as e:
+            rprint(f"[yellow]WARNING | migrate_pickle_dir: skipping {path} - {e}[/yellow]", file=sys.stderr)
+            n_bad += 1
+            continue
+
+        batch.append((os.path.basename(path)[:-4], value, created))
+        n_ok += 1
+        if len(batch) >= batch_size:
+            _flush()
+
+    if batch:
+        _flush()
+
+    if n_ok > 0:
+        mark_legacy(cache_dir) # .pkl entries were written under pre-v2 keys
+
+    return {"cache_dir" : cache_dir, "n_migrated" : n_ok, "n_skipped" : n_bad}
+
+
+def migrate_tree(root='./.cache', delete=False):
+    """ migrate every directory under `root` that contains `.pkl` files """
+    out = []
+    for dirpath, _, filenames in os.walk(root):
+        if any(f.endswith('.pkl') for f in filenames):
+            res = migrate_pickle_dir(dirpath, delete=delete)
+            rprint(f"[green]migrate_tree: {res}[/green]", file=sys.stderr)
+            out.append(res)
+
+    return out
+
+# --
+# CLI
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="cmd", required=True)
+
+    migrate_parser = subparsers.add_parser("migrate", help="import legacy .pkl cache trees into the sqlite backend")
+    migrate_parser.add_argument("--root",   type=str,            default="./.cache")
+    migrate_parser.add_argument("--delete", action="store_true", default=False)
+
+    mark_parser = subparsers.add_parser("mark-legacy", help="look up pre-v2 cache keys on a miss in this namespace (caches written before v2 keys)")
+    mark_parser.add_argument("--cache_dir", type=str, required=True)
+
+    stats_parser = subparsers.add_parser("stats", help="entries / bytes per sqlite namespace")
+    stats_parser.add_argument("--root", type=str, default="./.cache")
+
+    train_parser = subparsers.add_parser("train-dict", help="train a zstd dictionary for a namespace")
+    train_parser.add_argument("--cache_dir", type=str, required=True)
+    train_parser.add_argument("--dict_size", type=int, default=112_640)
+
+    compress_parser = subparsers.add_parser("compress", help="(re)compress every entry of a namespace with zstd")
+    compress_parser.add_argument("--cache_dir", type=str, required=True)
+    compress_parser.add_argument("--level",     type=int, default=3)
+
+    bench_parser = subparsers.add_parser("bench", help="disk footprint vs load latency for each codec")
+    bench_parser.add_argument("--cache_dir", type=str, required=True)
+    bench_parser.add_argument("--n_samples", type=int, default=500)
+
+    args = parser.parse_args()
+
+    if args.cmd == "migrate":
+        migrate_tree(args.root, delete=args.delete)
+
+    elif args.cmd == "mark-legacy":
+        mark_legacy(args.cache_dir)
+
+    elif args.cmd == "stats":
+        for dirpath, _, filenames in sorted(os.walk(args.root)):
+            if "cache.sqlite" in filenames or "cache-00.sqlite" in filenames:
+                n_shards = len([f for f in filenames if f.startswith("cache-") and f.endswith(".sqlite")]) or 1
+                rprint(dirpath, SQLiteBackend(dirpath, n_shards=n_shards).stats())
+
+    elif args.cmd == "train-dict":
+        rprint(train_dict(args.cache_dir, dict_size=args.dict_size))
+
+    elif args.cmd == "compress":
+        rprint(recompress(args.cache_dir, Codec(args.cache_dir, compress="zstd", level=args.level)))
+
+    elif args.cmd == "bench":
+        from rich.table import Table
+        
+        results = bench_codecs(args.cache_dir, n_samples=args.n_samples)
+        table   = Table(title=f"codecs @ {args.cache_dir}")
+        for col in results[0].keys():
+            table.add_column(col)
+        for row in results:
+            table.add_row(*[f"{v:.3f}" if isinstance(v, float) else str(v) for v in row.values()])
+        rprint(table)
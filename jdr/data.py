@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+    jdr.data
+
+    Benchmark datasets.
+
+    The first time a dataset is used, it's downloaded and written to `./.cache/datasets/<name>-<hash>.arrow` (Arrow
+    IPC).  After that, it's memory-mapped and only the query + answer columns are read - no network, no `datasets` /
+    `pandas` import.  The hash covers the dataset's config, so changing a config re-materializes it.
+
+    Custom datasets:
+        register_dataset("mine", loader="csv", config={"path" : "mine.csv"}, query="question", answer="answer")
+        register_dataset("other", loader=my_fn, config={"version" : 2}, query="q", answer="a") # my_fn(**config) -> pa.Table | pd.DataFrame
+"""
+
+import os
+import json
+import tempfile
+import pyarrow as pa
+from hashlib import md5
+
+DATA_DIR = "./.cache/datasets"
+
+WIKIPEDIA_ONLY   = "You are only allowed to use Wikipedia as a source of information.  You can prefix your query with `site:wikipedia.org` to search only Wikipedia. Remember to actually visit the webpages using `ascrape_jina`."
+PREFER_WIKIPEDIA = "Today's date is June 23, 2025. You strongly prefer using Wikipedia as your source of information.  If you can't completely answer the question using Wikipedia, you're welcome to visit other sites.  Remember to actually visit the webpages using `ascrape_jina`."
+
+# --
+# Loaders - config -> pa.Table | pd.DataFrame
+
+def _load_hf(**config):
+    from datasets import load_dataset as hf_load_dataset
+    return hf_load_dataset(**config).data.table
+
+def _load_csv(path, **kwargs):
+    import pandas as pd
+    return pd.read_csv(path, **kwargs)
+
+def _load_parquet(path, **kwargs):
+    import pandas as pd
+    return pd.read_parquet(path, **kwargs)
+
+def _load_jsonl(path, **kwargs):
+    import pandas as pd
+    return pd.read_json(path, lines=True, **kwargs)
+
+LOADERS = {
+    "hf"      : _load_hf,
+    "csv"     : _load_csv,
+    "parquet" : _load_parquet,
+    "jsonl"   : _load_jsonl,
+}
+
+# --
+# Registry
+
+DATASETS = {}
+
+def register_dataset(name, loader, config, query, answer, special_instructions=None):
+    """ `loader` is a key of `LOADERS` or a callable; `query` / `answer` are column names """
+    DATASETS[name] = {
+        "loader"               : loader,
+        "config"               : config,
+        "query"                : query,
+        "answer"               : answer,
+        "special_instructions" : special_instructions,
+    }
+
+register_dataset(
+    "frames",
+    loader               = "hf",
+    config               = {"path" : "Intelligent-Internet/frames-benchmark", "split" : "benchmark"},
+    query                = "prompt",
+    answer               = "answer",
+    special_instructions = WIKIPEDIA_ONLY,
+)
+
+register_dataset(
+    "seal0",
+    loader               = "hf",
+    config               = {"path" : "vtllms/sealqa", "name" : "seal_0", "split" : "test"},
+    query                = "question",
+    answer               = "answer",
+    special_instructions = PREFER_WIKIPEDIA,
+)
+
+register_dataset(
+    "simpleqa",
+    loader               = "csv",
+    config               = {"path" : "https://openaipublic.blob.core.windows.net/simple-evals/simple_qa_test_set.csv"},
+    query                = "problem",
+    answer               = "answer",
+    special_instructions = PREFER_WIKIPEDIA,
+)
+
+def get_dataset(name):
+    if name not in DATASETS:
+        raise ValueError(f"Dataset {name} not supported - registered: {list(DATASETS.keys())}")
+    return DATASETS[name]
+
+# --
+# Materialize + load
+
+def dataset_path(name, data_dir=DATA_DIR):
+    spec   = get_dataset(name)
+    loader = spec['loader'] if isinstance(spec['loader'], str) else getattr(spec['loader'], '__qualname__', repr(spec['loader']))
+    h      = md5(json.dumps([loader, spec['config']], sort_keys=True).encode()).hexdigest()[:12]
+    return os.path.join(data_dir, f"{name}-{h}.arrow")
+
+def materialize(name, data_dir=DATA_DIR, force=False):
+    """ download `name` and write it to an Arrow IPC file (all columns) -> path """
+    path = dataset_path(name, data_dir)
+    if os.path.exists(path) and not force:
+        return path
+
+    spec   = get_dataset(name)
+    loader = LOADERS[spec['loader']] if isinstance(spec['loader'], str) else spec['loader']
+    table  = loader(**spec['config'])
+    if not isinstance(table, pa.Table):
+        table = pa.Table.from_pandas(table, preserve_index=False)
+
+    # write + rename, so an interrupted download never leaves a truncated file
+    os.makedirs(data_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=data_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f, pa.ipc.new_file(f, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    return path
+
+def load_dataset(name, data_dir=DATA_DIR):
+    """ -> (queries, targets), as lists, in the dataset's original order """
+    spec = get_dataset(name)
+    path = materialize(name, data_dir)
+
+    # memory-mapped, so the columns we don't select are never read
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all().select([spec['query'], spec['answer']])
+        return table.column(0).to_pylist(), table.column(1).to_pylist()
+
+# --
+# CLI
+
+if __name__ == "__main__":
+    import argparse
+    from rich import print as rprint
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset",  type=str, nargs='+', default=list(DATASETS.keys()))
+    parser.add_argument("--data_dir", type=str, default=DATA_DIR)
+    parser.add_argument("--force",    action="store_true", help="re-download even if already materialized")
+    args = parser.parse_args()
+
+    for name in args.dataset:
+        path = materialize(name, data_dir=args.data_dir, force=args.force)
+        rprint(f"[green]{name}: {path} ({os.path.getsize(path) / 2**20:.1f} MB)[/green]")
@@ -11,6 +11,9 @@ from litellm import acompletion
 from rich import print as rprint
 
 from jdr.utils import disk_cache
+from jdr.ratelimit import with_retries
+
+_acompletion = with_retries(acompletion)
 
 @disk_cache(cache_dir="./.cache/frames_autograder", verbose=False)
 async def frames_evaluator(query, target, response):
@@ -19,7 +22,7 @@ async def frames_evaluator(query, target, response):
     PROMPT = PROMPT.format(QUERY=query, TARGET=target, RESPONSE=response)
     PROMPT = PROMPT.strip()
     
-    response = await acompletion(
+    response = await _acompletion(
         model    = "gemini/gemini-2.5-pro-preview-06-05", # originally "gemini/gemini-pro-1.5-0514" - no longer available
         messages = [
             {"role" : "system", "content" : "You are a helpful assistant"},
@@ -59,7 +62,7 @@ async def simpleqa_evaluator(query, target, response, model, no_system_prompt=Fa
         messages = messages[1:]
     
     
-    response = await acompletion(
+    response = await _acompletion(
         model       = model,
         messages    = messages,
         **extra_params
@@ -120,16 +123,22 @@ class MultiEvaluator:
                 target   = target,
                 response = response,
             )
-            if grades[evaluator_name]['correct']:
-                self.n_correct[evaluator_name] += 1
         
-        self.n_total += 1
+        self.update(grades)
         
         if verbose:
             self.print()
         
         return grades
     
+    def update(self, grades):
+        """ add one question's grades to the running tallies """
+        for evaluator_name in self.evaluators.keys():
+            if evaluator_name in grades and grades[evaluator_name]['correct']:
+                self.n_correct[evaluator_name] += 1
+        
+        self.n_total += 1
+    
     def print(self):
         _str = ""
         for k, v in self.n_correct.items():
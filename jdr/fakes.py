@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+"""
+    jdr.fakes
+
+    Offline stand-ins for SerpAPI, Jina and an OpenAI-compatible LLM, for load-testing the harness without
+    network access or API quota.
+
+    One localhost HTTP server (in a background thread) serves all three:
+        GET  /search.json?q=...      -> SerpAPI-style `organic_results`
+        GET  /<url>                  -> Jina reader-style `{"data" : {title, description, url, content}}`
+        POST /v1/chat/completions    -> scripted tool-calling agent: a few rounds of search / scrape, then `<output>`
+                                        (requests without `tools`, e.g. autograders, get "A")
+
+    Each provider has a lognormal latency (median `latency`, spread `sigma`), and injects 500s / 429s (w/
+    `Retry-After`) at `error_rate` / `rate_429`.  Configure w/ `JDR_FAKE_CONFIG='{"jina" : {"latency" : 5}}'`.
+    Pages are synthetic markdown, or - w/ `payloads_from` - contents replayed from an existing scrape cache.
+
+    Use via `jdr.benchmark --fake` (requires `JDR_CACHE_ROOT`, so fake results never land in the real cache), or
+    standalone:
+        python -m jdr.fakes --port 8765
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import pickle
+import random
+import threading
+import pyarrow as pa
+from hashlib import md5
+from copy import deepcopy
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from rich import print as rprint
+
+from jdr.data import register_dataset
+
+FAKE_MODEL = "openai/fake"
+
+DEFAULT_CONFIG = {
+    "serpapi" : {"latency" : 1.0, "sigma" : 0.5, "error_rate" : 0.0, "rate_429" : 0.0},
+    "jina"    : {"latency" : 4.0, "sigma" : 0.8, "error_rate" : 0.0, "rate_429" : 0.0},
+    "llm"     : {"latency" : 3.0, "sigma" : 0.5, "error_rate" : 0.0, "rate_429" : 0.0},
+
+    "retry_after"   : 1,      # seconds, on injected 429s
+    "n_results"     : 10,     # search results per query
+    "page_bytes"    : 20_000, # size of synthetic pages
+    "n_tool_rounds" : 4,      # tool-calling rounds before the fake LLM answers
+    "payloads_from" : None,   # e.g. "./.cache/scrape/jina" - replay page contents from a scrape cache
+    "seed"          : 123,
+}
+
+def load_config(config=None):
+    out = deepcopy(DEFAULT_CONFIG)
+    for k, v in {**json.loads(os.environ.get("JDR_FAKE_CONFIG", "{}")), **(config or {})}.items():
+        if isinstance(v, dict):
+            out[k] = {**out.get(k, {}), **v}
+        else:
+            out[k] = v
+    return out
+
+# --
+# Payloads
+
+WORDS = "the of and in to a was is for on as by with he at from his an were are which this also be has or had first one their its new after who they two her she been other when there all during into school time may years more most only over city some world would where later up such used many than these".split()
+
+def _rng(*parts):
+    return random.Random(md5("|".join(map(str, parts)).encode()).hexdigest())
+
+def _synthetic_page(url, page_bytes):
+    rng   = _rng(url)
+    title = " ".join(rng.choice(WORDS) for _ in range(4)).title()
+    parts = [f"# {title}\n"]
+    size  = len(parts[0])
+    while size < page_bytes:
+        if rng.random() < 0.1:
+            part = f"\n## {' '.join(rng.choice(WORDS) for _ in range(3)).title()}\n"
+        else:
+            part = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))) + ".\n\n"
+        parts.append(part)
+        size += len(part)
+
+    return title, "".join(parts)[:page_bytes]
+
+def load_payloads(cache_dir, n=200):
+    """ page contents from an existing `ascrape_jina` cache namespace """
+    from jdr.cache import get_backend, Codec
+
+    store  = get_backend(cache_dir)
+    codec  = Codec(cache_dir)
+    keys   = store.keys()
+    random.Random(0).shuffle(keys)
+
+    out = []
+    for key in keys[:n]:
+        try:
+            out.append(pickle.loads(codec.decode(store.get(key))).content)
+        except Exception:
+            continue
+
+    return out
+
+# --
+# Fake LLM
+
+def _find_tool(tools, *names):
+    for tool in tools:
+        if any(name in tool['function']['name'] for name in names):
+            return tool['function']
+    return tools[0]['function']
+
+def _last_urls(messages):
+    for msg in reversed(messages):
+        if msg.get('role') == 'tool' and '<url>' in (msg.get('content') or ''):
+            return [x.split('</url>')[0] for x in msg['content'].split('<url>')[1:]]
+    return []
+
+def _fake_completion(body, config):
+    messages = body['messages']
+    tools    = body.get('tools') or []
+    n_rounds = sum(1 for msg in messages if msg.get('role') == 'assistant' and msg.get('tool_calls'))
+    query    = next((msg['content'] for msg in messages if msg.get('role') == 'user'), "")
+    rng      = _rng(query, n_rounds)
+
+    message = {"role" : "assistant", "content" : None}
+    if not tools:
+        message['content'] = "A"
+    elif n_rounds >= config['n_tool_rounds']:
+        message['content'] = f"<output>fake answer {md5(query.encode()).hexdigest()[:8]}</output>"
+    else:
+        urls = _last_urls(messages)
+        if n_rounds % 2 == 0 or not urls:
+            tool = _find_tool(tools, "search_serp")
+            args = {"queries" : [f"{query[:64]} {i}" for i in range(3)]} if "queries" in tool['parameters'].get('properties', {}) else {"query" : f"{query[:64]} {n_rounds}"}
+        else:
+            tool = _find_tool(tools, "scrape")
+            args = {"url" : rng.choice(urls)}
+
+        message['tool_calls'] = [{
+            "id"       : f"call_{rng.getrandbits(48):012x}",
+            "type"     : "function",
+            "function" : {"name" : tool['name'], "arguments" : json.dumps(args)},
+        }]
+
+    prompt_tokens     = sum(len(msg.get('content') or '') for msg in messages) // 4
+    completion_tokens = len(json.dumps(message)) // 4
+    return {
+        "id"      : f"chatcmpl-fake-{rng.getrandbits(48):012x}",
+        "object"  : "chat.completion",
+        "created" : int(time.time()),
+        "model"   : body.get('model', 'fake'),
+        "choices" : [{
+            "index"         : 0,
+            "message"       : message,
+            "finish_reason" : "tool_calls" if message.get('tool_calls') else "stop",
+        }],
+        "usage"   : {
+            "prompt_tokens"     : prompt_tokens,
+            "completion_tokens" : completion_tokens,
+            "total_tokens"      : prompt_tokens + completion_tokens,
+        },
+    }
+
+# --
+# Server
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keep-alive, like the real providers
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, str(v))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _fault(self, provider):
+        """ sleep for the provider's latency, then maybe inject an error -> True if a response was already sent """
+        server = self.server
+        conf   = server.config[provider]
+        with server.lock:
+            u       = server.rng.random()
+            latency = conf['latency'] * math.exp(conf['sigma'] * server.rng.gauss(0, 1))
+            server.stats[provider]['n_requests'] += 1
+
+        time.sleep(latency)
+        if u < conf['rate_429']:
+            server.stats[provider]['n_429'] += 1
+            self._send(429, {"error" : "rate limited (fake)"}, headers={"Retry-After" : server.config['retry_after']})
+            return True
+
+        if u < conf['rate_429'] + conf['error_rate']:
+            server.stats[provider]['n_errors'] += 1
+            self._send(500, {"error" : "internal error (fake)"})
+            return True
+
+        return False
+
+    def do_GET(self):
+        server = self.server
+        parts  = urlsplit(self.path)
+        if parts.path == "/search.json":
+            if self._fault("serpapi"):
+                return
+
+            query = parse_qs(parts.query).get('q', [''])[0]
+            rng   = _rng(query)
+            self._send(200, {"organic_results" : [{
+                "title"   : " ".join(rng.choice(WORDS) for _ in range(5)).title(),
+                "link"    : f"https://en.wikipedia.org/wiki/Fake_{rng.getrandbits(32):08x}",
+                "snippet" : " ".join(rng.choice(WORDS) for _ in range(30)),
+            } for _ in range(server.config['n_results'])]})
+        else:
+            if self._fault("jina"):
+                return
+
+            url          = self.path[1:]
+            title, page  = _synthetic_page(url, server.config['page_bytes'])
+            if server.payloads:
+                page = server.payloads[int(md5(url.encode()).hexdigest(), 16) % len(server.payloads)]
+
+            self._send(200, {"data" : {"title" : title, "description" : page[:200], "url" : url, "content" : page}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+        if not self.path.rstrip('/').endswith("/chat/completions"):
+            self._send(404, {"error" : f"unknown path {self.path}"})
+            return
+
+        if self._fault("llm"):
+            return
+
+        self._send(200, _fake_completion(body, self.server.config))
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # clients hang up on purpose (timeouts, hedged requests) - don't print a traceback for it
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeServer:
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = load_config(config)
+
+        self.httpd          = _HTTPServer((host, port), _Handler)
+        self.httpd.config   = self.config
+        self.httpd.rng      = random.Random(self.config['seed'])
+        self.httpd.lock     = threading.Lock()
+        self.httpd.stats    = defaultdict(Counter)
+        self.httpd.payloads = load_payloads(self.config['payloads_from']) if self.config['payloads_from'] else None
+        self.httpd.daemon_threads = True
+
+        self.url     = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    @property
+    def env(self):
+        """ env vars that point `asearch_serp` / `ascrape_jina` here """
+        return {
+            "JDR_SERPAPI_URL" : f"{self.url}/search.json",
+            "JDR_JINA_URL"    : self.url,
+            "SERPAPI_API_KEY" : "fake",
+            "JINA_API_KEY"    : "fake",
+        }
+
+    @property
+    def model_config(self):
+        """ litellm kwargs that point `acompletion` here """
+        return {"model" : FAKE_MODEL, "api_base" : f"{self.url}/v1", "api_key" : "fake"}
+
+    def stats(self):
+        return {k:dict(v) for k, v in self.httpd.stats.items()}
+
+def start_fake_server(config=None, host="127.0.0.1", port=0, set_env=True):
+    server = FakeServer(config, host=host, port=port).start()
+    if set_env:
+        os.environ.update(server.env)
+    return server
+
+# --
+# Fake dataset
+
+def _fake_questions(n, seed):
+    rng     = random.Random(seed)
+    queries = [f"Fake question {i}: " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 60))) + "?" for i in range(n)]
+    return pa.table({"query" : queries, "answer" : [f"answer {i}" for i in range(n)]})
+
+register_dataset("fake", loader=_fake_questions, config={"n" : 1000, "seed" : 0}, query="query", answer="answer")
+
+__all__ = ["FakeServer", "start_fake_server", "load_payloads", "FAKE_MODEL"]
+
+# --
+# CLI
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host",   type=str, default="127.0.0.1")
+    parser.add_argument("--port",   type=int, default=8765)
+    parser.add_argument("--config", type=str, default=None, help="JSON, merged over JDR_FAKE_CONFIG")
+    args = parser.parse_args()
+
+    server = start_fake_server(json.loads(args.config) if args.config else None, host=args.host, port=args.port, set_env=False)
+    for k, v in server.env.items():
+        print(f"export {k}={v}")
+    rprint(f"[green]jdr.fakes: serving on {server.url} - litellm: {server.model_config}[/green]", file=sys.stderr)
+
+    try:
+        while True:
+            time.sleep(10)
+            rprint(server.stats(), file=sys.stderr)
+    except KeyboardInterrupt:
+        server.close()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""
+    jdr.metrics
+
+    Per-question + per-run summaries of the `metrics` blocks `ToolCallAgent` attaches to trace messages.
+
+    Assistant messages carry LLM time / tokens (incl. provider prompt-cache reads) / cost, tool messages carry
+    tool time, and both carry the `disk_cache` status ("hit", "miss", "coalesced") and the phase ("main", "double_check" or "finalize").
+
+    Summarize saved results:
+        python -m jdr.metrics --indirs results/frames/jdr-toolcall/<model> ...
+
+    Compare variants (accuracy vs. latency / tokens / cost):
+        python -m jdr.metrics --tradeoff --indirs results/frames/jdr-toolcall/<model> results/frames/jdr-toolcall/<model>+double_check=gated ...
+"""
+
+import json
+import numpy as np
+from pathlib import Path
+from collections import Counter
+from rich import print as rprint
+
+QUANTILES = [50, 95, 99]
+
+def question_metrics(trace, elapsed=None):
+    """ one question's trace -> flat dict of totals (seconds, tokens, dollars, counts) """
+    out = Counter()
+    if elapsed is not None:
+        out['elapsed'] = elapsed
+
+    for msg in trace:
+        metrics = msg.get('metrics') if isinstance(msg, dict) else None
+        if not metrics:
+            continue
+
+        for k, v in (metrics.get('prefetch') or {}).items():
+            out[f'prefetch.{k}'] += v
+
+        if metrics.get('budget'):
+            out['budget_exhausted'] += 1
+            out[f"budget_exhausted.{metrics['budget']['exhausted']}"] += 1
+
+        if metrics.get('double_check'):
+            decision = metrics['double_check']
+            out['double_check.gated']   += 1
+            out['double_check.skipped'] += int(not decision['needed'])
+            for reason in decision['reasons']:
+                out[f'double_check.reason.{reason}'] += 1
+
+            verifier = decision.get('verifier') or {}
+            out['verifier_time']     += verifier.get('llm_time') or 0
+            out['prompt_tokens']     += verifier.get('prompt_tokens') or 0 # counted in the totals, so gated runs aren't flattered
+            out['completion_tokens'] += verifier.get('completion_tokens') or 0
+            out['cost']              += verifier.get('cost') or 0
+
+        phase  = metrics.get('phase', 'main')
+        cached = metrics.get('cache') in ('hit', 'coalesced')
+        if msg['role'] == 'assistant':
+            out['n_llm_calls']              += 1
+            out['n_llm_cached']             += int(cached)
+            out['llm_time']                 += metrics['llm_time']
+            out[f'llm_time.{phase}']        += metrics['llm_time']
+            out['double_checked']            = max(out['double_checked'], int(phase == 'double_check'))
+            out['prompt_tokens']            += metrics.get('prompt_tokens') or 0
+            out['completion_tokens']        += metrics.get('completion_tokens') or 0
+            out['reasoning_tokens']         += metrics.get('reasoning_tokens') or 0
+            out['cached_tokens']            += metrics.get('cached_tokens') or 0
+            out['cache_write_tokens']       += metrics.get('cache_write_tokens') or 0
+            out['cost']                     += metrics.get('cost') or 0
+            out['compaction_time']          += metrics.get('compaction_time') or 0
+        elif msg['role'] == 'tool':
+            tool = metrics['tool']
+            out['n_tool_calls']             += 1
+            out['n_tool_cached']            += int(cached)
+            out['n_tool_errors']            += int(metrics.get('error') is not None)
+            out['tool_time']                += metrics['tool_time']
+            out[f'tool_time.{tool}']        += metrics['tool_time']
+            out[f'tool_time.{phase}']       += metrics['tool_time']
+
+    return dict(out)
+
+def summarize(rows):
+    """ list of `question_metrics` dicts -> {field : {mean, p50, p95, p99, total}} """
+    fields = sorted(set(k for row in rows for k in row))
+    out    = {}
+    for field in fields:
+        x = np.array([row.get(field, 0) for row in rows], dtype=float)
+        out[field] = {
+            "mean"  : float(x.mean()),
+            **{f"p{q}" : float(np.percentile(x, q)) for q in QUANTILES},
+            "total" : float(x.sum()),
+        }
+
+    return out
+
+def print_summary(summary, title=None):
+    from rich.table import Table
+
+    table = Table(title=title)
+    table.add_column("field")
+    for col in ["mean"] + [f"p{q}" for q in QUANTILES] + ["total"]:
+        table.add_column(col, justify="right")
+
+    for field, v in summary.items():
+        table.add_row(field, *[f"{v[col]:.4g}" for col in ["mean"] + [f"p{q}" for q in QUANTILES] + ["total"]])
+
+    rprint(table)
+
+def tradeoff(results):
+    """ results (dicts w/ `grades` + `metrics`, e.g. from `iter_results`) -> one row of accuracy vs. latency / tokens / cost """
+    rows  = [result['metrics'] for result in results]
+    names = sorted(set(k for result in results for k in result['grades']))
+
+    elapsed = np.array([row.get('elapsed', 0) for row in rows], dtype=float)
+    out     = {"n" : len(results)}
+    for name in names:
+        out[f"acc.{name}"] = float(np.mean([bool(result['grades'].get(name, {}).get('correct')) for result in results]))
+    out["elapsed.mean"]       = float(elapsed.mean())
+    out["elapsed.p95"]        = float(np.percentile(elapsed, 95))
+    out["prompt_tokens.mean"] = float(np.mean([row.get('prompt_tokens', 0) for row in rows]))
+    out["cached_tokens.mean"] = float(np.mean([row.get('cached_tokens', 0) for row in rows]))
+    out["cost.mean"]          = float(np.mean([row.get('cost', 0) for row in rows]))
+    out["double_checked"]     = float(np.mean([row.get('double_checked', 0) for row in rows]))
+    return out
+
+def print_tradeoffs(tradeoffs, title="accuracy vs. cost"):
+    """ {run name : `tradeoff` row} -> table, one row per run (e.g. double_check always / gated / never) """
+    from rich.table import Table
+
+    fields = list(dict.fromkeys(k for row in tradeoffs.values() for k in row))
+    table  = Table(title=title)
+    table.add_column("run")
+    for field in fields:
+        table.add_column(field, justify="right")
+
+    for name, row in tradeoffs.items():
+        table.add_row(name, *[f"{row[field]:.4g}" if field in row else "-" for field in fields])
+
+    rprint(table)
+
+def iter_results(indir):
+    """ yields {mid, grades, metrics} per result in indir - each trace is dropped once its metrics are computed """
+    for path in sorted(Path(indir).glob("*.json")):
+        if path.name == "report.json":
+            continue
+
+        try:
+            with open(path) as f:
+                result = json.load(f)
+            row = {
+                "mid"     : result['mid'],
+                "grades"  : result['grades'],
+                "metrics" : question_metrics(result['trace'], elapsed=result.get('elapsed')),
+            }
+        except Exception as e:
+            rprint(f"[yellow]WARNING | iter_results: ignoring {path} - {e}[/yellow]")
+            continue
+
+        yield row
+
+def load_results(indir):
+    return list(iter_results(indir))
+
+def load_dir(indir):
+    return [result['metrics'] for result in load_results(indir)]
+
+# --
+# CLI
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--indirs",  type=str, nargs='+', required=True)
+    parser.add_argument("--tradeoff", action='store_true', default=False, help="one row per indir: accuracy vs. latency / tokens / cost")
+    args = parser.parse_args()
+
+    if args.tradeoff:
+        print_tradeoffs({indir : tradeoff(load_results(indir)) for indir in args.indirs})
+    else:
+        for indir in args.indirs:
+            print_summary(summarize(load_dir(indir)), title=str(indir))
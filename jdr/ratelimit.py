@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+"""
+    jdr.ratelimit
+
+    Per-provider token-bucket rate limiting + retries w/ jittered exponential backoff.
+
+    Providers are plain strings - "serpapi", "jina", or a litellm model name.  Limits are process-wide, so every
+    concurrent agent draws from the same budget.  Configure via `set_rate_limit` or
+    `JDR_RATE_LIMITS='{"serpapi" : 5, "gemini/gemini-2.5-flash-preview-05-20" : [2, 10]}'` (requests/sec, optional burst).
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+from functools import wraps
+from email.utils import parsedate_to_datetime
+from collections import Counter, defaultdict
+from rich import print as rprint
+
+MAX_RETRIES   = int(os.environ.get("JDR_MAX_RETRIES", 5))
+BASE_DELAY    = 1.0
+MAX_DELAY     = 60.0
+RETRY_STATUS  = {408, 429, 500, 502, 503, 504}
+
+_STATS = defaultdict(Counter) # provider -> n_requests, n_ok, latency_sum, n_retries, n_429, n_failures
+
+# --
+# Rate limiting
+
+class TokenBucket:
+    """
+        `rate` requests/sec, bursts of up to `burst`.  `rate=None` means unlimited (but still honors `pause`).
+
+        No asyncio.Lock on purpose - check-and-take has no await in between, so it's atomic on one loop, and the
+        bucket can be reused across `asyncio.run` calls.
+    """
+
+    def __init__(self, rate=None, burst=None):
+        self.rate         = rate
+        self.burst        = burst if burst is not None else max(1, rate or 1)
+        self.tokens       = self.burst
+        self.updated      = time.monotonic()
+        self.paused_until = 0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+
+            if self.rate is None:
+                return
+
+            self.tokens  = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """ e.g. on a 429 w/ Retry-After - nobody sends to this provider until it's over """
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+_BUCKETS = {}
+
+def _load_env_limits():
+    out = {}
+    for provider, v in json.loads(os.environ.get("JDR_RATE_LIMITS", "{}")).items():
+        rate, burst = (v, None) if not isinstance(v, list) else v
+        out[provider] = TokenBucket(rate, burst)
+    return out
+
+_BUCKETS.update(_load_env_limits())
+
+def set_rate_limit(provider, rate, burst=None):
+    _BUCKETS[provider] = TokenBucket(rate, burst)
+
+def get_bucket(provider):
+    if provider not in _BUCKETS:
+        _BUCKETS[provider] = TokenBucket(None)
+    return _BUCKETS[provider]
+
+# --
+# Retries
+
+class RetryableStatus(Exception):
+    """ raised by callers that get a retryable status code back as a value (e.g. an httpx response) """
+
+    def __init__(self, status_code, retry_after=None, response=None):
+        super().__init__(f"status_code={status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.response    = response
+
+def parse_retry_after(value):
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+def _status_code(e):
+    return getattr(e, 'status_code', None)
+
+def _retry_after(e):
+    if getattr(e, 'retry_after', None) is not None:
+        return e.retry_after
+
+    # litellm exceptions carry the provider's httpx response (or its headers)
+    headers = getattr(getattr(e, 'response', None), 'headers', None) or getattr(e, 'litellm_response_headers', None)
+    if headers:
+        return parse_retry_after(headers.get('retry-after'))
+
+    return None
+
+def _is_retryable(e):
+    if _status_code(e) in RETRY_STATUS:
+        return True
+
+    # connection resets, timeouts, ... (httpx.TransportError, litellm.APIConnectionError, ...)
+    return any(k in type(e).__name__ for k in ["Transport", "Connect", "Timeout", "RemoteProtocol"])
+
+async def aretry(fn, *args, provider, max_retries=None, **kwargs):
+    """ `await fn(*args, **kwargs)` through `provider`'s token bucket, retrying 429 / 5xx / connection errors """
+    if max_retries is None:
+        max_retries = MAX_RETRIES
+
+    bucket = get_bucket(provider)
+    stats  = _STATS[provider]
+    for attempt in range(max_retries + 1):
+        await bucket.acquire()
+        stats['n_requests'] += 1
+        t = time.monotonic()
+        try:
+            out = await fn(*args, **kwargs)
+            stats['n_ok']        += 1
+            stats['latency_sum'] += time.monotonic() - t
+            return out
+        except Exception as e:
+            if not _is_retryable(e):
+                raise
+
+            status_code = _status_code(e)
+            retry_after = _retry_after(e)
+            if status_code == 429:
+                stats['n_429'] += 1
+
+            if attempt == max_retries:
+                stats['n_failures'] += 1
+                raise
+
+            backoff = min(MAX_DELAY, BASE_DELAY * 2 ** attempt)
+            delay   = retry_after if retry_after is not None else backoff / 2 + random.uniform(0, backoff / 2)
+            if status_code == 429:
+                bucket.pause(delay)
+
+            stats['n_retries'] += 1
+            rprint(f"[yellow]WARNING | aretry: {provider} - {type(e).__name__} {status_code} - retry {attempt + 1}/{max_retries} in {delay:.1f}s[/yellow]", file=sys.stderr)
+            await asyncio.sleep(delay)
+
+def with_retries(fn, provider=None):
+    """ wrap an async fn w/ `aretry` - if `provider` is None, it's the `model` kwarg (for litellm.acompletion) """
+    @wraps(fn)
+    async def _fn(*args, **kwargs):
+        return await aretry(fn, *args, provider=provider or kwargs.get('model'), **kwargs)
+
+    return _fn
+
+def ratelimit_stats():
+    return {k:dict(v) for k, v in _STATS.items()}
+
+__all__ = ["TokenBucket", "set_rate_limit", "aretry", "with_retries", "RetryableStatus", "ratelimit_stats"]
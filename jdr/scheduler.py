@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""
+    jdr.scheduler
+    
+    Scheduling questions in `jdr.benchmark`
+"""
+
+import sys
+import asyncio
+from rich import print as rprint
+
+from jdr.ratelimit import ratelimit_stats
+
+# --
+# Adaptive concurrency
+
+class AdaptiveConcurrency:
+    """
+        AIMD limit on the number of questions in flight.
+        
+        Every `interval` seconds, look at what happened since the last decision:
+          - any 429s, or error rate > `max_error_rate`              -> limit *= `decrease`
+          - mean provider call latency > `latency_factor` x the best -> limit *= `decrease`
+          - otherwise, if we actually used the current limit         -> limit += 1
+        
+        Provider signals (429s, per-call latency) come from `jdr.ratelimit`, so they reflect every tool + LLM call.
+        With `min_concurrency == max_concurrency` this is just a semaphore.
+    """
+    
+    def __init__(self, initial, min_concurrency, max_concurrency, interval=15, decrease=0.7, 
+                 latency_factor=2.0, max_error_rate=0.1, verbose=True):
+        
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit           = float(min(max(initial, min_concurrency), max_concurrency))
+        self.interval        = interval
+        self.decrease        = decrease
+        self.latency_factor  = latency_factor
+        self.max_error_rate  = max_error_rate
+        self.verbose         = verbose
+        
+        self.in_flight       = 0
+        self.max_in_flight   = 0 # high-water mark since the last decision
+        self.n_done          = 0
+        self.n_errors        = 0
+        self.best_latency    = None
+        self.history         = [] # (limit, reason) per decision
+        
+        self._cond           = asyncio.Condition()
+        self._task           = None
+        self._last           = self._provider_totals()
+    
+    @property
+    def adaptive(self):
+        return self.min_concurrency < self.max_concurrency
+    
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight    += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+    
+    async def release(self, ok=True):
+        async with self._cond:
+            self.in_flight -= 1
+            self.n_done    += 1
+            self.n_errors  += int(not ok)
+            self._cond.notify_all()
+    
+    def start(self):
+        if self.adaptive and self._task is None:
+            self._task = asyncio.ensure_future(self._arun())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+    
+    async def _arun(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._adjust()
+    
+    def _provider_totals(self):
+        stats = ratelimit_stats().values()
+        return {
+            "n_429"       : sum(v.get('n_429', 0) for v in stats),
+            "n_ok"        : sum(v.get('n_ok', 0) for v in stats),
+            "latency_sum" : sum(v.get('latency_sum', 0) for v in stats),
+        }
+    
+    async def _adjust(self):
+        totals  = self._provider_totals()
+        delta   = {k:totals[k] - self._last[k] for k in totals}
+        latency = delta['latency_sum'] / delta['n_ok'] if delta['n_ok'] > 0 else None
+        
+        error_rate = self.n_errors / self.n_done if self.n_done > 0 else 0
+        
+        old = self.limit
+        if delta['n_429'] > 0:
+            reason     = f"{delta['n_429']} x 429"
+            self.limit = self.limit * self.decrease
+        elif error_rate > self.max_error_rate:
+            reason     = f"error_rate={error_rate:.2f}"
+            self.limit = self.limit * self.decrease
+        elif latency is not None and self.best_latency is not None and latency > self.latency_factor * self.best_latency:
+            reason     = f"latency={latency:.2f}s > {self.latency_factor} x {self.best_latency:.2f}s"
+            self.limit = self.limit * self.decrease
+        elif self.max_in_flight >= int(self.limit):
+            reason     = "healthy"
+            self.limit = self.limit + 1
+        else:
+            reason     = "healthy, limit not reached"
+        
+        self.limit = min(max(self.limit, self.min_concurrency), self.max_concurrency)
+        if latency is not None:
+            self.best_latency = latency if self.best_latency is None else min(self.best_latency, latency)
+        
+        self.history.append((self.limit, reason))
+        if self.verbose and int(self.limit) != int(old):
+            rprint(f"[blue]AdaptiveConcurrency: {int(old)} -> {int(self.limit)} ({reason}, in_flight={self.in_flight})[/blue]", file=sys.stderr)
+        
+        self._last         = totals
+        self.max_in_flight = self.in_flight
+        self.n_done        = 0
+        self.n_errors      = 0
+        
+        async with self._cond:
+            self._cond.notify_all()
+
+# --
+# Streaming
+
+_DONE = object()
+
+async def astream(items, fn, on_result, n_workers, queue_size=None, priority=None):
+    """
+        `on_result(item, await fn(*item))` for every item, w/ `n_workers` workers pulling from a bounded queue.
+        
+        Only `queue_size` items (default: 2 x n_workers) are waiting at any time, and results are handed to 
+        `on_result` as soon as they finish, so memory doesn't grow with the number of items.  `priority(item)` 
+        (lower runs first) orders the items - this needs the full list of items, but not their results.
+    """
+    if priority is not None:
+        items = sorted(items, key=priority)
+    
+    queue = asyncio.Queue(maxsize=queue_size or 2 * n_workers)
+    
+    async def _producer():
+        for item in items:
+            await queue.put(item)
+        for _ in range(n_workers):
+            await queue.put(_DONE)
+    
+    async def _worker():
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            
+            on_result(item, await fn(*item))
+    
+    workers = [asyncio.ensure_future(_worker()) for _ in range(n_workers)]
+    try:
+        await asyncio.gather(_producer(), *workers)
+    finally:
+        for worker in workers:
+            worker.cancel()
+
+
+__all__ = ["AdaptiveConcurrency", "astream"]
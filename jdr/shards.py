@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""
+    jdr.shards
+    
+    Run `jdr.benchmark` as several processes (or hosts) and merge their results.
+    
+    Questions are partitioned by `int(mid, 16) % n_shards`, so any process - on this host or another one sharing 
+    the filesystem - can run `python -m jdr.benchmark ... --shard i/N` independently.
+    
+    Launch N local shards (extra args after `--` go to `jdr.benchmark`):
+        python -m jdr.shards launch --n_shards 4 -- --dataset frames --resume
+    
+    Or just shards 2 and 3 of 4 on this host:
+        python -m jdr.shards launch --n_shards 4 --shard_ids 2 3 -- --dataset frames
+    
+    Merge per-shard result directories (or report on a shared one):
+        python -m jdr.shards merge --indirs results/a results/b --outdir results/merged
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+from collections import Counter
+from rich import print as rprint
+
+# --
+# Launch
+
+def launch(n_shards, benchmark_args, shard_ids=None, log_dir=None):
+    """ -> ({shard_idx : returncode}, [outdirs the shards wrote to]) """
+    if shard_ids is None:
+        shard_ids = list(range(n_shards))
+    
+    if log_dir is not None:
+        os.makedirs(log_dir, exist_ok=True)
+    
+    # each shard reports the outdir it resolved (w/ every +variant suffix), so we don't have to re-derive it
+    outdir_dir = log_dir or tempfile.mkdtemp(prefix="jdr-shards-")
+    
+    procs = []
+    for shard_idx in shard_ids:
+        outdir_file = os.path.join(outdir_dir, f"shard-{shard_idx}.outdir")
+        cmd = [sys.executable, "-m", "jdr.benchmark", *benchmark_args, "--shard", f"{shard_idx}/{n_shards}", "--outdir_file", outdir_file]
+        out = open(os.path.join(log_dir, f"shard-{shard_idx}.log"), "w") if log_dir is not None else None
+        rprint(f"[green]launch: {' '.join(cmd)}[/green]", file=sys.stderr)
+        procs.append((shard_idx, subprocess.Popen(cmd, stdout=out, stderr=subprocess.STDOUT if out else None), out))
+    
+    returncodes = {}
+    for shard_idx, proc, out in procs:
+        returncodes[shard_idx] = proc.wait()
+        if out is not None:
+            out.close()
+        
+        color = "green" if returncodes[shard_idx] == 0 else "red"
+        rprint(f"[{color}]launch: shard {shard_idx}/{n_shards} exited with {returncodes[shard_idx]}[/{color}]", file=sys.stderr)
+    
+    outdirs = set()
+    for shard_idx in shard_ids:
+        outdir_file = os.path.join(outdir_dir, f"shard-{shard_idx}.outdir")
+        if os.path.exists(outdir_file):
+            with open(outdir_file) as f:
+                outdirs.add(f.read().strip())
+    
+    return returncodes, sorted(outdirs)
+
+# --
+# Merge
+
+def _load_results(indir):
+    for path in sorted(Path(indir).glob("*.json")):
+        if path.name == "report.json":
+            continue
+        try:
+            with open(path) as f:
+                yield path, json.load(f)
+        except Exception as e:
+            rprint(f"[yellow]WARNING | merge: ignoring {path} - {e}[/yellow]", file=sys.stderr)
+
+def merge(indirs, outdir=None):
+    """ combine result dirs (one result per mid) and recompute evaluator tallies -> report dict (+ outdir/report.json) """
+    if outdir is not None:
+        os.makedirs(outdir, exist_ok=True)
+    
+    n_correct = Counter()
+    n_total   = 0
+    elapsed   = []
+    sources   = Counter()
+    seen      = set()
+    for indir in indirs:
+        for path, result in _load_results(indir):
+            if result['mid'] in seen:
+                continue
+            seen.add(result['mid'])
+            
+            if outdir is not None and Path(path).parent.resolve() != Path(outdir).resolve():
+                shutil.copy2(path, Path(outdir) / path.name)
+            
+            n_total += 1
+            sources[str(indir)] += 1
+            elapsed.append(result.get('elapsed', 0))
+            for evaluator_name, grade in result['grades'].items():
+                n_correct[evaluator_name] += int(bool(grade['correct']))
+    
+    report = {
+        "n_total"   : n_total,
+        "accuracy"  : {k:v / n_total for k, v in sorted(n_correct.items())} if n_total else {},
+        "n_correct" : dict(sorted(n_correct.items())),
+        "elapsed"   : {
+            "mean" : sum(elapsed) / len(elapsed) if elapsed else None,
+            "max"  : max(elapsed) if elapsed else None,
+        },
+        "sources"   : dict(sources),
+    }
+    
+    if outdir is not None:
+        with open(Path(outdir) / "report.json", "w") as f:
+            json.dump(report, f, indent=2)
+    
+    return report
+
+def print_report(report):
+    _str = ""
+    for k, v in report['n_correct'].items():
+        _str += f"E-{k} - {v:03d}/{report['n_total']:03d} - {report['accuracy'][k]:0.4f} | "
+    rprint(_str.strip(' | '))
+    rprint(report)
+
+# --
+# CLI
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser     = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="cmd", required=True)
+    
+    launch_parser = subparsers.add_parser("launch", help="run jdr.benchmark as N shard processes, then report")
+    launch_parser.add_argument("--n_shards",  type=int, required=True)
+    launch_parser.add_argument("--shard_ids", type=int, nargs='+', default=None, help="only launch these shards (e.g. split shards across hosts)")
+    launch_parser.add_argument("--log_dir",   type=str, default=None, help="write each shard's output to <log_dir>/shard-<i>.log")
+    
+    merge_parser = subparsers.add_parser("merge", help="merge result directories and recompute evaluator tallies")
+    merge_parser.add_argument("--indirs", type=str, nargs='+', required=True)
+    merge_parser.add_argument("--outdir", type=str, default=None)
+    
+    args, extra = parser.parse_known_args()
+    if extra and extra[0] == "--":
+        extra = extra[1:]
+    
+    if args.cmd == "launch":
+        returncodes, outdirs = launch(args.n_shards, extra, shard_ids=args.shard_ids, log_dir=args.log_dir)
+        
+        if len(outdirs) == 1:
+            print_report(merge(outdirs, outdir=outdirs[0]))
+        elif len(outdirs) > 1:
+            rprint(f"[yellow]WARNING | launch: shards wrote to different outdirs {outdirs} - reporting on all of them[/yellow]", file=sys.stderr)
+            print_report(merge(outdirs))
+        else:
+            rprint("[red]ERROR | launch: no shard reported its outdir[/red]", file=sys.stderr)
+        
+        sys.exit(int(any(code != 0 for code in returncodes.values()))) # killed shards have negative codes
+    
+    elif args.cmd == "merge":
+        print_report(merge(args.indirs, outdir=args.outdir))
@@ -1,8 +1,15 @@
 import json
+import asyncio
+from time import perf_counter
 from vertexai.generative_models import FunctionDeclaration
 
+from .http_client import *
 from .search import *
 from .scrape import *
+from .pages import *
+from .local_index import *
+from .prefetch import *
+from jdr.utils import last_cache_status, reset_cache_status
 
 # --
 # Wrapper class
@@ -28,18 +35,54 @@ def _recursive_lowercase(x):
     else:
         return x.lower()
 
+TOOL_ERROR = """
+<tool_error>
+<tool>{TOOL}</tool>
+<error>{ERROR}</error>
+<hint>{HINT}</hint>
+</tool_error>
+""".strip()
+
+async def _acall(tool, tool_args):
+    """ -> (result, cache status of *this* call) - `wait_for` may run the tool in its own task (and context) """
+    reset_cache_status() # the context was copied from the caller, which may have just made a cached LLM call
+    tool_result = await tool(**tool_args)
+    return tool_result, last_cache_status()
+
 class ToolBox:
-    def __init__(self, tools, force_lowercase=False):
-        self.tools = tools
-        self.sigs  = [_function_to_dict(tool) for tool in tools.values()]
+    def __init__(self, tools, force_lowercase=False, timeouts=None, default_timeout=None):
+        """ timeouts: tool name -> seconds (default: `default_timeout`, None = wait forever) """
+        self.tools           = tools
+        self.timeouts        = timeouts or {}
+        self.default_timeout = default_timeout
+        self.sigs            = [_function_to_dict(tool) for tool in tools.values()]
         if force_lowercase:
             self.sigs = _recursive_lowercase(self.sigs)
     
-    async def arun(self, tool_call):
+    async def arun(self, tool_call, prefetcher=None):
         assert tool_call["type"] == "function"
         tool_name   = tool_call.function.name
         tool_args   = json.loads(tool_call.function.arguments)
-        tool_result = await self.tools[tool_name](**tool_args)
+        if prefetcher is not None:
+            prefetcher.note_use(tool_name, tool_args)
+        
+        timeout     = self.timeouts.get(tool_name, self.default_timeout)
+        error       = None
+        cache       = None
+        t           = perf_counter()
+        try:
+            tool_result, cache = await asyncio.wait_for(_acall(self.tools[tool_name], tool_args), timeout=timeout)
+        except asyncio.TimeoutError:
+            # cancels the call - `disk_cache` only cancels the underlying request if no one else is waiting on it
+            error       = "timeout"
+            tool_result = TOOL_ERROR.format(
+                TOOL  = tool_name,
+                ERROR = f"timed out after {timeout}s",
+                HINT  = "The source may be slow or unavailable.  Try again, or try a different query / page.",
+            )
+        tool_time   = perf_counter() - t
+        if prefetcher is not None and error is None:
+            prefetcher.observe(tool_name, tool_args, tool_result)
         if not isinstance(tool_result, str):
             tool_result = tool_result.to_txt()
         
@@ -49,5 +92,11 @@ class ToolBox:
             "role"          : "tool",
             "name"          : tool_call.function.name,
             "tool_call_id"  : tool_call.id,
-            "content"       : tool_result
+            "content"       : tool_result,
+            "metrics"       : {
+                "tool"      : tool_name,
+                "tool_time" : tool_time,
+                "cache"     : cache,
+                "error"     : error,
+            },
         }
\ No newline at end of file
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""
+    jdr.tools.http_client
+
+    Process-wide, pooled HTTP client shared by all tools and baselines
+"""
+
+import os
+import sys
+import time
+import httpx
+import asyncio
+import numpy as np
+from functools import partial
+from urllib.parse import urlsplit
+from collections import Counter, defaultdict, deque
+from rich import print as rprint
+
+from jdr.ratelimit import aretry, get_bucket, RetryableStatus, RETRY_STATUS, parse_retry_after
+
+HTTP2           = os.environ.get("JDR_HTTP2", "0") == "1"
+MAX_CONNECTIONS = int(os.environ.get("JDR_HTTP_MAX_CONNECTIONS", 128))
+MAX_PER_HOST    = int(os.environ.get("JDR_HTTP_MAX_PER_HOST", 32))
+KEEPALIVE       = float(os.environ.get("JDR_HTTP_KEEPALIVE", 60))
+
+# hedging (opt-in): if a request is slower than the rolling p`HEDGE_QUANTILE` latency, fire a duplicate and keep the winner
+HEDGE             = os.environ.get("JDR_HEDGE", "0") == "1"
+HEDGE_QUANTILE    = 95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW      = 200
+
+# Jina's browser engine can take minutes on large pages - bound how long we wait to *connect*, be generous on reads
+DEFAULT_TIMEOUT = httpx.Timeout(connect=10, read=300, write=30, pool=None)
+
+_STATS     = defaultdict(Counter)                            # host -> n_requests, n_connections, n_errors, n_hedged, n_hedge_wins
+_LATENCIES = defaultdict(lambda: deque(maxlen=HEDGE_WINDOW)) # host -> recent successful request latencies
+
+class _LoopState:
+    """ httpx clients + asyncio primitives are bound to an event loop, so we keep one of these per loop """
+
+    def __init__(self):
+        http2 = HTTP2
+        if http2:
+            try:
+                import h2
+            except ImportError:
+                rprint("[yellow]WARNING | http_client: JDR_HTTP2=1 but `h2` is not installed - falling back to HTTP/1.1[/yellow]", file=sys.stderr)
+                http2 = False
+
+        self.client = httpx.AsyncClient(
+            http2   = http2,
+            timeout = DEFAULT_TIMEOUT,
+            limits  = httpx.Limits(
+                max_connections           = MAX_CONNECTIONS,
+                max_keepalive_connections = MAX_CONNECTIONS,
+                keepalive_expiry          = KEEPALIVE,
+            ),
+        )
+        self.host_semaphores = defaultdict(lambda: asyncio.Semaphore(MAX_PER_HOST))
+
+_STATES = {}
+
+def _get_state():
+    loop = asyncio.get_running_loop()
+    for closed in [_loop for _loop in _STATES if _loop.is_closed()]:
+        del _STATES[closed]
+
+    if loop not in _STATES:
+        _STATES[loop] = _LoopState()
+
+    return _STATES[loop]
+
+def get_client():
+    """ the shared `httpx.AsyncClient` for the running event loop """
+    return _get_state().client
+
+def _trace(host):
+    async def _fn(event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            _STATS[host]['n_connections'] += 1
+
+    return _fn
+
+async def _arequest(state, host, method, url, **kwargs):
+    async with state.host_semaphores[host]:
+        _STATS[host]['n_requests'] += 1
+        t = time.monotonic()
+        try:
+            res = await state.client.request(method, url, extensions={"trace" : _trace(host)}, **kwargs)
+        except httpx.HTTPError:
+            _STATS[host]['n_errors'] += 1
+            raise
+        
+        if res.status_code < 400:
+            _LATENCIES[host].append(time.monotonic() - t)
+        return res
+
+def _hedge_delay(host):
+    latencies = _LATENCIES[host]
+    if len(latencies) < HEDGE_MIN_SAMPLES:
+        return None
+    return float(np.percentile(latencies, HEDGE_QUANTILE))
+
+async def _arequest_duplicate(state, host, method, url, provider=None, **kwargs):
+    if provider is not None:
+        await get_bucket(provider).acquire() # the duplicate is a real request - it has to respect the provider's rate limit too
+    return await _arequest(state, host, method, url, **kwargs)
+
+async def _arequest_hedged(state, host, method, url, provider=None, **kwargs):
+    """ `_arequest`, plus a duplicate if the first one is still running after the p95 latency - first success wins, the other is cancelled """
+    delay = _hedge_delay(host)
+    if delay is None:
+        return await _arequest(state, host, method, url, **kwargs)
+    
+    tasks = [asyncio.ensure_future(_arequest(state, host, method, url, **kwargs))]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            _STATS[host]['n_hedged'] += 1
+            tasks.append(asyncio.ensure_future(_arequest_duplicate(state, host, method, url, provider=provider, **kwargs)))
+        
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            ok            = [task for task in done if task.exception() is None]
+            if ok or not pending:
+                task = (ok or list(done))[0]
+                if task is not tasks[0]:
+                    _STATS[host]['n_hedge_wins'] += 1
+                return task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def arequest(method, url, provider=None, hedge=False, **kwargs):
+    """
+        `client.request`, through the shared pool, with at most `MAX_PER_HOST` in-flight requests per host.
+        
+        If `provider` is set, the request goes through that provider's rate limit, and 429 / 5xx / connection 
+        errors are retried (see `jdr.ratelimit`).  If retries run out on a bad status, the last response is returned.
+        
+        `hedge=True` sends a duplicate request if the first is slower than this host's recent p95 (only for 
+        idempotent requests - e.g. scrapes), if hedging is enabled w/ `JDR_HEDGE=1`.  The duplicate takes a token 
+        from `provider`'s rate limit before it is sent.
+    """
+    state      = _get_state()
+    host       = urlsplit(url).hostname
+    request_fn = partial(_arequest_hedged, provider=provider) if (hedge and HEDGE) else _arequest
+    
+    if provider is None:
+        return await request_fn(state, host, method, url, **kwargs)
+    
+    async def _fn():
+        res = await request_fn(state, host, method, url, **kwargs)
+        if res.status_code in RETRY_STATUS:
+            raise RetryableStatus(res.status_code, retry_after=parse_retry_after(res.headers.get('retry-after')), response=res)
+        return res
+    
+    try:
+        return await aretry(_fn, provider=provider)
+    except RetryableStatus as e:
+        return e.response
+
+async def aclose_clients():
+    """ close the client for the running loop (call before the loop shuts down, e.g. at the end of `jdr.benchmark`) """
+    loop = asyncio.get_running_loop()
+    if loop in _STATES:
+        await _STATES.pop(loop).client.aclose()
+
+def http_stats():
+    """ per-host request counts, new connections opened, and how many requests reused a pooled connection """
+    out = {}
+    for host, c in _STATS.items():
+        out[host] = {
+            "n_requests"    : c['n_requests'],
+            "n_connections" : c['n_connections'],
+            "n_reused"      : max(0, c['n_requests'] - c['n_connections']),
+            "n_errors"      : c['n_errors'],
+            "n_hedged"      : c['n_hedged'],
+            "n_hedge_wins"  : c['n_hedge_wins'],
+        }
+
+    return out
+
+__all__ = ["get_client", "arequest", "aclose_clients", "http_stats"]
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+"""
+    jdr.tools.local_index
+
+    Full-text (BM25) search over every page we've scraped before.
+
+    When enabled (`JDR_LOCAL_INDEX=1`, or `--local_search` in `jdr.benchmark`), pages are added to a SQLite FTS5
+    index as they pass through the `ascrape_jina` cache (hits included), so the index grows w/ every run.  Postings are read through mmap.  `asearch_local` returns `SearchResults`, like
+    `asearch_serp`, w/o a SerpAPI round trip.
+
+    CLI:
+        python -m jdr.tools.local_index build             # index everything already in ./.cache/scrape/jina
+        python -m jdr.tools.local_index bench             # query latency
+        python -m jdr.tools.local_index search --query "..."
+"""
+
+import os
+import re
+import sys
+import time
+import pickle
+import sqlite3
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from rich import print as rprint
+
+from jdr.utils import disk_cache, resolve_cache_dir
+from jdr.tools.search import SearchResult, SearchResults
+
+INDEX_DIR     = resolve_cache_dir("./.cache/local_index")
+ENABLED       = os.environ.get("JDR_LOCAL_INDEX", "0") == "1"
+MMAP_BYTES    = 2**30
+N_RESULTS     = 10
+SNIPPET_WORDS = 48
+
+class LocalIndex:
+    """ SQLite FTS5 index of scraped pages - one row per url, BM25-ranked w/ titles weighted over content """
+
+    SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS docs (id INTEGER PRIMARY KEY, url TEXT UNIQUE NOT NULL, added REAL NOT NULL)",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(title, content, tokenize='porter unicode61')",
+    ]
+
+    def __init__(self, index_dir=INDEX_DIR, timeout=60):
+        os.makedirs(index_dir, exist_ok=True)
+        self.path    = os.path.join(index_dir, "index.sqlite")
+        self.timeout = timeout
+        self._local  = threading.local()
+        self._seen   = set() # urls known to be indexed, so repeat scrapes don't touch sqlite
+
+        conn = self._conn()
+        for stmt in self.SCHEMA:
+            conn.execute(stmt)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={MMAP_BYTES}")
+        return conn
+
+    def add_many(self, results, replace=False):
+        """ index `ScrapeResult`s -> number of new pages """
+        conn  = self._conn()
+        n_new = 0
+        with conn:
+            conn.execute("BEGIN IMMEDIATE") # take the write lock up front - a deferred read -> write upgrade fails at once under contention
+            for result in results:
+                if result.url in self._seen and not replace:
+                    continue
+
+                row = conn.execute("SELECT id FROM docs WHERE url = ?", (result.url,)).fetchone()
+                if row is not None:
+                    if not replace:
+                        self._seen.add(result.url)
+                        continue
+                    conn.execute("DELETE FROM pages WHERE rowid = ?", (row[0],))
+                    conn.execute("DELETE FROM docs WHERE id = ?", (row[0],))
+
+                doc_id = conn.execute("INSERT INTO docs (url, added) VALUES (?, ?)", (result.url, time.time())).lastrowid
+                conn.execute("INSERT INTO pages (rowid, title, content) VALUES (?, ?, ?)", (doc_id, result.title, result.content))
+                self._seen.add(result.url)
+                n_new += 1
+
+        return n_new
+
+    def add(self, result):
+        return self.add_many([result])
+
+    def search(self, query, k=N_RESULTS):
+        """ -> [(title, url, snippet, score)], best first """
+        terms = re.findall(r"\w+", query.lower())
+        if not terms:
+            return []
+
+        match = " OR ".join(f'"{term}"' for term in terms) # bare words only - no FTS5 query syntax from the LLM
+        rows  = self._conn().execute(f"""
+            SELECT pages.title, docs.url, snippet(pages, 1, '', '', '...', {SNIPPET_WORDS}), bm25(pages, 5.0, 1.0) AS score
+            FROM pages JOIN docs ON docs.id = pages.rowid
+            WHERE pages MATCH ?
+            ORDER BY score
+            LIMIT ?
+        """, (match, k)).fetchall()
+
+        return [(title, url, snippet, -score) for title, url, snippet, score in rows]
+
+    def stats(self):
+        conn = self._conn()
+        return {
+            "n_pages" : conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0],
+            "n_bytes" : sum(os.path.getsize(self.path + ext) for ext in ["", "-wal"] if os.path.exists(self.path + ext)),
+        }
+
+_INDEX      = None
+_INDEX_LOCK = threading.Lock()
+
+def get_index():
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            _INDEX = LocalIndex()
+    return _INDEX
+
+# one writer thread - SQLite only allows one writer anyway, and this keeps indexing off the `disk_cache` I/O pool
+_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local_index")
+
+def _add(result):
+    try:
+        get_index().add(result)
+    except Exception as e:
+        rprint(f"[red]local_index: Error indexing {result.url} {e}[/red]", file=sys.stderr)
+
+def set_indexing(enabled):
+    """ turn indexing of scraped pages on / off for this process (see `JDR_LOCAL_INDEX`) """
+    global ENABLED
+    ENABLED = enabled
+
+def index_scrape_result(params, result):
+    """ `disk_cache(on_result=...)` hook for `ascrape_jina` - queues the page for the writer thread """
+    if ENABLED and result is not None:
+        _WRITER.submit(_add, result)
+
+# --
+# Tool
+
+@disk_cache(cache_dir="./.cache/search/local", verbose=False)
+async def asearch_local(query: str) -> str:
+    """ Search the pages we have already downloaded (mostly Wikipedia) for a single query - fast, but only covers pages visited before """
+    loop = asyncio.get_running_loop()
+    rows = await loop.run_in_executor(None, get_index().search, query)
+    return SearchResults(
+        query   = query,
+        results = [SearchResult(title=title, url=url, content=snippet) for title, url, snippet, _ in rows],
+    )
+
+__all__ = ["asearch_local"]
+
+# --
+# Build + bench
+
+def build_from_cache(cache_dir="./.cache/scrape/jina", batch_size=256, index=None):
+    """ add every `ScrapeResult` in a scrape cache namespace to the index """
+    from jdr.cache import get_backend, Codec
+
+    cache_dir = resolve_cache_dir(cache_dir)
+    index     = index or get_index()
+    store     = get_backend(cache_dir)
+    codec     = Codec(cache_dir)
+
+    t      = time.perf_counter()
+    n_seen = 0
+    n_new  = 0
+    batch  = []
+    for key in store.keys():
+        value = store.get(key)
+        if value is None:
+            continue
+
+        try:
+            batch.append(pickle.loads(codec.decode(value)))
+        except Exception as e:
+            rprint(f"[yellow]WARNING | build_from_cache: skipping {key} - {e}[/yellow]", file=sys.stderr)
+            continue
+
+        n_seen += 1
+        if len(batch) >= batch_size:
+            n_new += index.add_many(batch)
+            batch  = []
+
+    n_new  += index.add_many(batch)
+    elapsed = time.perf_counter() - t
+    return {"n_seen" : n_seen, "n_new" : n_new, "elapsed" : elapsed, "pages_per_sec" : n_seen / elapsed if elapsed else None, **index.stats()}
+
+def bench(queries, index=None, k=N_RESULTS):
+    import numpy as np
+
+    index = index or get_index()
+    times = []
+    for query in queries:
+        t = time.perf_counter()
+        index.search(query, k=k)
+        times.append(time.perf_counter() - t)
+
+    times = np.array(times) * 1000
+    return {
+        "n_queries" : len(queries),
+        "p50_ms"    : float(np.percentile(times, 50)),
+        "p95_ms"    : float(np.percentile(times, 95)),
+        "p99_ms"    : float(np.percentile(times, 99)),
+        **index.stats(),
+    }
+
+# --
+# CLI
+
+if __name__ == "__main__":
+    import argparse
+    import random
+
+    parser     = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="cmd", required=True)
+
+    build_parser = subparsers.add_parser("build", help="index every page in a scrape cache")
+    build_parser.add_argument("--cache_dir", type=str, default="./.cache/scrape/jina")
+
+    bench_parser = subparsers.add_parser("bench", help="query latency, w/ queries sampled from indexed titles")
+    bench_parser.add_argument("--n_queries", type=int, default=1000)
+
+    search_parser = subparsers.add_parser("search")
+    search_parser.add_argument("--query", type=str, required=True)
+
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        rprint(build_from_cache(args.cache_dir))
+
+    elif args.cmd == "bench":
+        titles  = [row[0] for row in get_index()._conn().execute("SELECT title FROM pages")]
+        queries = [random.choice(titles) for _ in range(args.n_queries)] if titles else []
+        rprint(bench(queries) if queries else "index is empty - run `build` first")
+
+    elif args.cmd == "search":
+        rprint(get_index().search(args.query)) # not `asearch_local` - that's cached, and would hide pages indexed since
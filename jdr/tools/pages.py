@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+"""
+    jdr.tools.pages
+
+    Read webpages a section at a time.
+
+    `ascrape_outline` returns a page's outline instead of its full content; the agent then pulls in only the parts
+    it needs w/ `afind_in_page` (BM25 over the page's chunks) or `aread_page_section`.  Pages come from
+    `ascrape_jina` (so they share its cache) and are split + indexed once per process.
+"""
+
+import re
+import math
+import asyncio
+from collections import Counter, OrderedDict
+from pydantic import BaseModel
+
+from jdr.tools.scrape import ascrape_jina
+
+MAX_CHUNK_CHARS = 2_000
+MAX_PAGES       = 256   # pages kept split + indexed in memory
+PREVIEW_CHARS   = 100
+TOP_K           = 3
+
+# --
+# Chunking
+
+_ATX     = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_SETEXT  = re.compile(r"^(=+|-+)\s*$")
+
+def _sections(content):
+    """ markdown -> [(heading path, text)], split on ATX (`## x`) and setext (`x\\n---`) headings """
+    out   = []
+    path  = []
+    lines = []
+
+    def _flush():
+        text = "\n".join(lines).strip()
+        if text:
+            out.append((" > ".join(h for _, h in path) or "(top)", text))
+        lines.clear()
+
+    rows = content.split("\n")
+    for i, line in enumerate(rows):
+        m = _ATX.match(line)
+        if m:
+            level, heading = len(m.group(1)), m.group(2)
+        elif _SETEXT.match(line) and lines and lines[-1].strip() and i > 0 and rows[i - 1] == lines[-1]:
+            level, heading = (1 if line.startswith("=") else 2), lines.pop().strip()
+        else:
+            lines.append(line)
+            continue
+
+        _flush()
+        path = [(l, h) for l, h in path if l < level] + [(level, heading)]
+
+    _flush()
+    return out
+
+def _split(text, max_chars):
+    """ split on paragraphs (then hard-wrap) so every piece is <= max_chars """
+    pieces = []
+    buf    = ""
+    for para in re.split(r"\n\s*\n", text):
+        if buf and len(para) > max_chars:
+            pieces.append(buf)
+            buf = ""
+
+        while len(para) > max_chars:
+            pieces.append(para[:max_chars])
+            para = para[max_chars:]
+
+        if buf and len(buf) + len(para) + 2 > max_chars:
+            pieces.append(buf)
+            buf = ""
+        buf = f"{buf}\n\n{para}" if buf else para
+
+    if buf:
+        pieces.append(buf)
+    return pieces
+
+def split_page(content, max_chars=MAX_CHUNK_CHARS):
+    """ -> [{"section" : heading path, "text" : ...}], each chunk <= max_chars """
+    chunks = []
+    for section, text in _sections(content):
+        pieces = _split(text, max_chars)
+        for i, piece in enumerate(pieces):
+            chunks.append({
+                "section" : section if len(pieces) == 1 else f"{section} (part {i + 1}/{len(pieces)})",
+                "text"    : piece,
+            })
+    return chunks
+
+# --
+# BM25
+
+def _tokenize(text):
+    return re.findall(r"\w+", text.lower())
+
+class BM25:
+    def __init__(self, docs, k1=1.5, b=0.75):
+        self.k1    = k1
+        self.b     = b
+        self.tfs   = [Counter(_tokenize(doc)) for doc in docs]
+        self.lens  = [sum(tf.values()) for tf in self.tfs]
+        self.avgdl = (sum(self.lens) / len(self.lens)) if self.lens else 0
+
+        df       = Counter(term for tf in self.tfs for term in tf)
+        n        = len(docs)
+        self.idf = {term : math.log(1 + (n - v + 0.5) / (v + 0.5)) for term, v in df.items()}
+
+    def scores(self, query):
+        terms = set(_tokenize(query))
+        out   = []
+        for tf, dl in zip(self.tfs, self.lens):
+            score = 0.0
+            for term in terms:
+                if term in tf:
+                    f      = tf[term]
+                    score += self.idf[term] * f * (self.k1 + 1) / (f + self.k1 * (1 - self.b + self.b * dl / (self.avgdl or 1)))
+            out.append(score)
+        return out
+
+# --
+# Page store
+
+class Page:
+    def __init__(self, scrape_result):
+        self.title       = scrape_result.title
+        self.description = scrape_result.description
+        self.url         = scrape_result.url
+        self.n_chars     = len(scrape_result.content)
+        self.chunks      = split_page(scrape_result.content)
+        self.index       = BM25([f"{c['section']}\n{c['text']}" for c in self.chunks])
+
+_PAGES  = OrderedDict() # url -> Page, LRU
+_BUILDS = {}            # url -> task building its Page, so concurrent calls for one url share the work
+
+async def _abuild_page(url):
+    try:
+        result = await ascrape_jina(url)
+        page   = await asyncio.get_running_loop().run_in_executor(None, Page, result) # splitting + BM25 is CPU-bound
+        _PAGES[url] = page
+        while len(_PAGES) > MAX_PAGES:
+            _PAGES.popitem(last=False)
+        return page
+    finally:
+        _BUILDS.pop(url, None)
+
+async def aget_page(url):
+    if url in _PAGES:
+        _PAGES.move_to_end(url)
+        return _PAGES[url]
+
+    if url not in _BUILDS:
+        _BUILDS[url] = asyncio.ensure_future(_abuild_page(url))
+
+    return await asyncio.shield(_BUILDS[url]) # one caller timing out doesn't cancel the build for the others
+
+# --
+# Output objects
+
+def _chunk_txt(idx, chunk):
+    return f"<section id=\"{idx}\">\n<heading>{chunk['section']}</heading>\n<content>{chunk['text']}</content>\n</section>"
+
+class PageOutline(BaseModel):
+    title       : str
+    description : str
+    url         : str
+    n_chars     : int
+    sections    : list[str]
+
+    def to_txt(self):
+        sections = "\n".join(self.sections) if self.sections else "NO CONTENT"
+        return f"<page_outline>\n<title>{self.title}</title>\n<description>{self.description}</description>\n<url>{self.url}</url>\n<sections n_chars=\"{self.n_chars}\">\n{sections}\n</sections>\n</page_outline>\nUse `afind_in_page` to search this page, or `aread_page_section` to read a section."
+
+class PageSections(BaseModel):
+    url      : str
+    sections : list[tuple[int, dict]]
+    note     : str = ""
+
+    def to_txt(self):
+        if len(self.sections) == 0:
+            return f"<page_sections>\n<url>{self.url}</url>\nNO MATCHING SECTIONS{' - ' + self.note if self.note else ''}\n</page_sections>"
+
+        sections = "\n".join(_chunk_txt(idx, chunk) for idx, chunk in self.sections)
+        return f"<page_sections>\n<url>{self.url}</url>\n{sections}\n</page_sections>"
+
+# --
+# Tools
+
+async def ascrape_outline(url: str) -> str:
+    """ Download a webpage, and return its title and outline (numbered sections w/ a short preview) instead of the full content """
+    page = await aget_page(url)
+    return PageOutline(
+        title       = page.title,
+        description = page.description,
+        url         = page.url,
+        n_chars     = page.n_chars,
+        sections    = [
+            f"[{i}] {chunk['section']} ({len(chunk['text'])} chars): {' '.join(chunk['text'][:PREVIEW_CHARS].split())}..."
+            for i, chunk in enumerate(page.chunks)
+        ],
+    )
+
+async def afind_in_page(url: str, query: str) -> str:
+    """ Return the sections of a webpage that best match a keyword query """
+    page   = await aget_page(url)
+    scores = page.index.scores(query)
+    top    = sorted([i for i, s in enumerate(scores) if s > 0], key=lambda i: -scores[i])[:TOP_K]
+    return PageSections(url=url, sections=[(i, page.chunks[i]) for i in sorted(top)], note=f"no matches for `{query}`")
+
+async def aread_page_section(url: str, section: int) -> str:
+    """ Return one section of a webpage, by its number in the outline from `ascrape_outline` """
+    page    = await aget_page(url)
+    section = int(section)
+    if not 0 <= section < len(page.chunks):
+        return PageSections(url=url, sections=[], note=f"section must be between 0 and {len(page.chunks) - 1}")
+
+    return PageSections(url=url, sections=[(section, page.chunks[section])])
+
+__all__ = ["ascrape_outline", "afind_in_page", "aread_page_section"]
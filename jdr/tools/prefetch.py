@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+    jdr.tools.prefetch
+
+    Speculatively scrape the top search results while the LLM is still deciding what to read.
+
+    A `Prefetcher` lives for one agent run.  `ToolBox.arun` shows it every tool result; for search results, it
+    starts `ascrape_jina(url)` on the top-k urls in the background - w/ the same arguments the agent would use, so
+    a later scrape by the agent is a cache hit (or joins the in-flight call via `disk_cache`'s single-flight).
+"""
+
+import asyncio
+from collections import Counter
+
+from jdr.utils import last_cache_status
+from jdr.tools.scrape import ascrape_jina
+from jdr.tools.search import SearchResults, MultiSearchResults
+
+class Prefetcher:
+    """
+        top_k  : urls to prefetch per search call (round-robin across queries for `asearch_serp_multi`)
+        budget : max prefetches per run
+        prefer : urls containing this come first (the agent is usually told to stick to Wikipedia)
+
+        stats:
+            n_prefetched - prefetches started
+            n_fetched    - ... that actually went to Jina (cache misses)
+            n_hits       - agent scrapes of a prefetched url (n_hits_inflight: prefetch hadn't finished yet)
+            n_wasted     - fetched, but never scraped by the agent
+            n_cancelled  - still running when the run ended
+    """
+
+    def __init__(self, top_k=3, budget=10, prefer="wikipedia.org", scrape=ascrape_jina):
+        self.top_k  = top_k
+        self.budget = budget
+        self.prefer = prefer
+        self.scrape = scrape
+
+        self.tasks  = {}  # url -> task
+        self.status = {}  # url -> "hit" | "miss" | "coalesced" | "error"
+        self.used   = set()
+        self.counts = Counter()
+
+    def _urls(self, result):
+        if isinstance(result, MultiSearchResults):
+            per_query = [[r.url for r in x.results] for x in result.results]
+            urls      = [q[i] for i in range(max(map(len, per_query), default=0)) for q in per_query if i < len(q)]
+        elif isinstance(result, SearchResults):
+            urls = [r.url for r in result.results]
+        else:
+            return []
+
+        if self.prefer:
+            urls = sorted(urls, key=lambda url: self.prefer not in url) # stable
+        return urls
+
+    async def _fetch(self, url):
+        try:
+            await self.scrape(url)
+            self.status[url] = last_cache_status()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.status[url] = "error"
+
+    def observe(self, tool_name, tool_args, tool_result):
+        """ called by `ToolBox.arun` w/ every tool call's (un-stringified) result """
+        n_started = 0
+        for url in self._urls(tool_result):
+            if n_started >= self.top_k or len(self.tasks) >= self.budget:
+                break
+
+            if url in self.tasks or url in self.used:
+                continue
+
+            self.tasks[url] = asyncio.ensure_future(self._fetch(url))
+            self.counts['n_prefetched'] += 1
+            n_started += 1
+
+    def note_use(self, tool_name, tool_args):
+        """ called by `ToolBox.arun` before every tool call """
+        url = tool_args.get('url')
+        if url is None:
+            return
+
+        self.used.add(url)
+        if url in self.tasks:
+            self.counts['n_hits'] += 1
+            if not self.tasks[url].done():
+                self.counts['n_hits_inflight'] += 1
+
+    async def aclose(self):
+        """ cancel unfinished prefetches (end of run) """
+        pending = [task for task in self.tasks.values() if not task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self.counts['n_cancelled'] += len(pending)
+
+    def stats(self):
+        out = {k:0 for k in ['n_prefetched', 'n_fetched', 'n_hits', 'n_hits_inflight', 'n_wasted', 'n_cancelled', 'n_errors']}
+        out.update(self.counts)
+        out['n_fetched'] = sum(status == "miss" for status in self.status.values())
+        out['n_errors']  = sum(status == "error" for status in self.status.values())
+        out['n_wasted']  = sum(status == "miss" and url not in self.used for url, status in self.status.items())
+        return out
+
+__all__ = ["Prefetcher"]
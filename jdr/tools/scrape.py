@@ -7,12 +7,13 @@
 
 import os
 import sys
-import httpx
 import asyncio
 from pydantic import BaseModel
 from rich import print as rprint
 
 from jdr.utils import disk_cache
+from jdr.tools.http_client import arequest
+from jdr.tools.local_index import index_scrape_result
 
 # --
 # Output object
@@ -31,7 +32,7 @@ class ScrapeResult(BaseModel):
 # --
 # Functions
 
-@disk_cache(cache_dir="./.cache/scrape/jina", verbose=False)
+@disk_cache(cache_dir="./.cache/scrape/jina", verbose=False, compress="zstd", on_result=index_scrape_result)
 async def ascrape_jina(url: str, _verbose: bool = True) -> str:
     """ Download a webpage """
     
@@ -39,7 +40,7 @@ async def ascrape_jina(url: str, _verbose: bool = True) -> str:
     if not API_KEY:
         raise Exception("JINA_API_KEY is not set")
     
-    url     = f"https://r.jina.ai/{url}"
+    url     = f"{os.environ.get('JDR_JINA_URL', 'https://r.jina.ai')}/{url}" # e.g. `jdr.fakes`
 
     headers = {
         "Accept"          : "application/json",
@@ -50,28 +51,27 @@ async def ascrape_jina(url: str, _verbose: bool = True) -> str:
     }
     
     try:
-        async with httpx.AsyncClient(timeout=None) as client:
-            if _verbose:
-                rprint(f"[bright_black]ascrape_jina: fetching : {url}[/bright_black]", file=sys.stderr)
-            res = await client.get(url, headers=headers)
-            if _verbose:
-                rprint(f"[bright_black]ascrape_jina: fetched  : {url}[/bright_black]", file=sys.stderr)
-            
-            if res.status_code != 200:
-                rprint(f"[red]ERROR | scrape_jina: status_code != 200 - {res.status_code}[/red]", file=sys.stderr)
-                raise Exception(f"ERROR | scrape_jina: status_code != 200 - {res.status_code}")
-            
-            data = res.json().get("data", None)
-            if not data:
-                rprint(f"[red]WARNING | scrape_jina: results is None[/red]", file=sys.stderr)
-                raise Exception("ERROR | scrape_jina: results is None")
-            
-            return ScrapeResult(
-                title       = data["title"],
-                description = data["description"],
-                url         = data["url"],
-                content     = data["content"],
-            )
+        if _verbose:
+            rprint(f"[bright_black]ascrape_jina: fetching : {url}[/bright_black]", file=sys.stderr)
+        res = await arequest("GET", url, provider="jina", hedge=True, headers=headers)
+        if _verbose:
+            rprint(f"[bright_black]ascrape_jina: fetched  : {url}[/bright_black]", file=sys.stderr)
+        
+        if res.status_code != 200:
+            rprint(f"[red]ERROR | scrape_jina: status_code != 200 - {res.status_code}[/red]", file=sys.stderr)
+            raise Exception(f"ERROR | scrape_jina: status_code != 200 - {res.status_code}")
+        
+        data = res.json().get("data", None)
+        if not data:
+            rprint(f"[red]WARNING | scrape_jina: results is None[/red]", file=sys.stderr)
+            raise Exception("ERROR | scrape_jina: results is None")
+        
+        return ScrapeResult(
+            title       = data["title"],
+            description = data["description"],
+            url         = data["url"],
+            content     = data["content"],
+        )
     
     except Exception as e:
         rprint(f"[red]ERROR | scrape_jina: {e}[/red]", file=sys.stderr)
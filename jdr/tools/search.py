@@ -7,12 +7,12 @@
 
 import os
 import sys
-import httpx
 import asyncio
 from pydantic import BaseModel
 from rich import print as rprint
 
 from jdr.utils import disk_cache
+from jdr.tools.http_client import arequest
 
 # --
 # Output object
@@ -59,40 +59,39 @@ async def asearch_serp(query:str, engine:str = "google", _verbose:bool = True) -
     if not API_KEY:
         raise Exception("SERPAPI_API_KEY is not set")
 
-    url    = "https://serpapi.com/search.json"
+    url    = os.environ.get("JDR_SERPAPI_URL", "https://serpapi.com/search.json") # e.g. `jdr.fakes`
     params = {"q": query, "api_key": API_KEY, "engine": engine}
     
     try:
-        async with httpx.AsyncClient(timeout=None) as client:
-            if _verbose:
-                rprint(f"[bright_black]asearch_serp: fetching : {query}[/bright_black]", file=sys.stderr)
-            res = await client.get(url, params=params)
-            if _verbose:
-                rprint(f"[bright_black]asearch_serp: fetched  : {query}[/bright_black]", file=sys.stderr)
-
-            if res.status_code != 200:
-                rprint(f"[red]ERROR | search_serp: status_code != 200 - {res.status_code}[/red]", file=sys.stderr)
-                raise Exception(f"ERROR | search_serp: status_code != 200 - {res.status_code}")
-            
-            data = res.json()
-            if not data:
-                rprint(f"[yellow]WARNING | search_serp: data is None[/yellow]", file=sys.stderr)
-                return SearchResults(query=query, results=[])
-            
-            if 'organic_results' not in data:
-                rprint(f"[yellow]WARNING | search_serp: organic_results not in data[/yellow]", file=sys.stderr)
-                return SearchResults(query=query, results=[])
-            
-            return SearchResults(
-                query   = query,
-                results = [
-                    SearchResult(
-                        title   = result["title"],
-                        url     = result["link"],
-                        content = result.get("snippet", "<missing>"),    
-                    ) for result in data["organic_results"] # [TODO] idk about this
-                ]
-            )
+        if _verbose:
+            rprint(f"[bright_black]asearch_serp: fetching : {query}[/bright_black]", file=sys.stderr)
+        res = await arequest("GET", url, provider="serpapi", params=params)
+        if _verbose:
+            rprint(f"[bright_black]asearch_serp: fetched  : {query}[/bright_black]", file=sys.stderr)
+
+        if res.status_code != 200:
+            rprint(f"[red]ERROR | search_serp: status_code != 200 - {res.status_code}[/red]", file=sys.stderr)
+            raise Exception(f"ERROR | search_serp: status_code != 200 - {res.status_code}")
+        
+        data = res.json()
+        if not data:
+            rprint(f"[yellow]WARNING | search_serp: data is None[/yellow]", file=sys.stderr)
+            return SearchResults(query=query, results=[])
+        
+        if 'organic_results' not in data:
+            rprint(f"[yellow]WARNING | search_serp: organic_results not in data[/yellow]", file=sys.stderr)
+            return SearchResults(query=query, results=[])
+        
+        return SearchResults(
+            query   = query,
+            results = [
+                SearchResult(
+                    title   = result["title"],
+                    url     = result["link"],
+                    content = result.get("snippet", "<missing>"),    
+                ) for result in data["organic_results"] # [TODO] idk about this
+            ]
+        )
 
     except Exception as e:
         rprint(f"[red]ERROR | search_serp: {e}[/red]", file=sys.stderr)
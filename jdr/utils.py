@@ -11,11 +11,263 @@ import pickle
 import hashlib
 import asyncio
 from functools import wraps
-from threading import Thread
-from concurrent.futures import Future
+from contextvars import ContextVar
+from collections import Counter, OrderedDict, defaultdict
+from threading import Thread, Lock
+from concurrent.futures import Future, ThreadPoolExecutor
 from rich import print as rprint
 
-def disk_cache(cache_dir='./.cache/search', verbose=False, ignore_fields=None):
+from jdr.cache import get_backend, CachePolicy, MemoryTier, Codec, LEGACY_MARKER, set_read_only, has_pickles
+
+_CACHE_STATS  = defaultdict(Counter)
+_CACHE_STORES = {}
+_CACHE_MEMORY = {}
+_CACHE_CODECS = {}
+
+# "hit" | "miss" | "coalesced" for the last disk_cache'd call awaited in this context (see `last_cache_status`)
+_CACHE_STATUS = ContextVar("disk_cache_status", default=None)
+
+# relocate the default `./.cache/...` namespaces, e.g. so load tests against `jdr.fakes` never touch the real cache
+CACHE_ROOT = os.environ.get("JDR_CACHE_ROOT") or None
+
+# readwrite (default) | readonly (never write) | replay (never compute - raise `CacheMissError` on a miss) | record (never read)
+CACHE_MODES = ["readwrite", "readonly", "replay", "record"]
+CACHE_MODE  = os.environ.get("JDR_CACHE_MODE", "readwrite")
+
+DEFAULT_MEMORY_BYTES = int(os.environ.get("JDR_CACHE_MEMORY_BYTES", 0))
+DEFAULT_COMPRESS     = os.environ.get("JDR_CACHE_COMPRESS") or None
+
+# cache reads/writes (+ (un)pickling) for async functions run here, so they never block the event loop
+_IO_POOL = ThreadPoolExecutor(max_workers=int(os.environ.get("JDR_CACHE_IO_WORKERS", 4)), thread_name_prefix="disk_cache")
+
+class CacheMissError(Exception):
+    """ a cache miss in replay mode - the call would have gone to the network """
+    
+    def __init__(self, cache_dir, cache_key, description):
+        super().__init__(f"cache miss in replay mode: {cache_dir} {cache_key} {description}")
+        self.cache_dir   = cache_dir
+        self.cache_key   = cache_key
+        self.description = description
+
+def set_cache_mode(mode):
+    """ set the mode for every `disk_cache` namespace in this process (see `JDR_CACHE_MODE`) """
+    global CACHE_MODE
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unknown cache mode {mode} - must be one of {CACHE_MODES}")
+    CACHE_MODE = mode
+    set_read_only(mode in ["readonly", "replay"])
+
+if CACHE_MODE not in CACHE_MODES:
+    raise ValueError(f"Unknown JDR_CACHE_MODE {CACHE_MODE} - must be one of {CACHE_MODES}")
+set_read_only(CACHE_MODE in ["readonly", "replay"])
+
+def resolve_cache_dir(cache_dir):
+    """ `./.cache/<namespace>` -> `$JDR_CACHE_ROOT/<namespace>`, if set """
+    if CACHE_ROOT is not None and cache_dir.startswith("./.cache/"):
+        return os.path.join(CACHE_ROOT, cache_dir[len("./.cache/"):])
+    return cache_dir
+
+def cache_stats(cache_dir=None, with_storage=True):
+    """
+        per-namespace counters: 
+            hits, misses, coalesced (concurrent identical calls that shared one in-flight call)
+            + memory_hits, memory_misses, memory_bytes, ... if the namespace has a memory tier
+            + (with_storage) n_entries, n_bytes, n_evicted, ... as reported by the backend
+    """
+    def _stats(cache_dir):
+        out   = dict(_CACHE_STATS[cache_dir])
+        if cache_dir in _CACHE_MEMORY:
+            out.update(_CACHE_MEMORY[cache_dir].stats())
+        
+        store = _CACHE_STORES.get(cache_dir)
+        if with_storage and hasattr(store, 'stats'):
+            out.update(store.stats())
+        return out
+    
+    if cache_dir is not None:
+        return _stats(resolve_cache_dir(cache_dir))
+    
+    return {k:_stats(k) for k in _CACHE_STATS.keys()}
+
+def last_cache_status():
+    """ "hit", "miss" or "coalesced" for the most recent disk_cache'd call made from the current task (else None) """
+    return _CACHE_STATUS.get()
+
+def reset_cache_status():
+    """ forget the status inherited from the parent task, so a later call w/o `disk_cache` reports None """
+    _CACHE_STATUS.set(None)
+
+# --
+# Cache keys
+#
+# v2 keys hash a canonical serialization of the bound arguments (sorted dict keys, pydantic models via 
+# `model_dump`, ...) instead of `str(sorted(params.items()))`.  Long strings (scraped pages, tool results) are 
+# hashed once and their digest is memoized by identity, so re-hashing a growing conversation only pays for the 
+# new messages.  The memo holds references to the strings, so it's bounded by total characters, not entries.
+#
+# On a miss, the pre-v2 md5 key (`str(sorted(params.items()))` - quadratic on a growing conversation) is only
+# tried for namespaces holding pre-v2 entries: `.pkl` trees, and namespaces marked w/ `LEGACY_MARKER` (written
+# by `jdr.cache migrate` / `jdr.cache mark-legacy`).  JDR_CACHE_LEGACY_KEYS=1 forces it on everywhere, 0 off.
+
+KEY_VERSION   = b"jdr-cache-v2"
+LEGACY_KEYS   = os.environ.get("JDR_CACHE_LEGACY_KEYS", "auto")
+if LEGACY_KEYS not in ["auto", "0", "1"]:
+    raise ValueError(f"Unknown JDR_CACHE_LEGACY_KEYS {LEGACY_KEYS} - must be one of ['auto', '0', '1']")
+
+_STR_MEMO_MIN   = 1024
+_STR_MEMO_CHARS = int(os.environ.get("JDR_CACHE_KEY_MEMO_CHARS", 32 * 2**20))
+_STR_MEMO       = OrderedDict() # id(s) -> (s, digest)
+_STR_MEMO_LCK   = Lock()
+_str_memo_chars = 0
+
+def _str_digest(x):
+    global _str_memo_chars
+    with _STR_MEMO_LCK:
+        entry = _STR_MEMO.get(id(x))
+        if entry is not None and entry[0] is x:
+            _STR_MEMO.move_to_end(id(x))
+            return entry[1]
+    
+    digest = hashlib.blake2b(x.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    if len(x) > _STR_MEMO_CHARS // 4:
+        return digest # too big to be worth pinning
+    
+    with _STR_MEMO_LCK:
+        if id(x) in _STR_MEMO:
+            _str_memo_chars -= len(_STR_MEMO.pop(id(x))[0])
+        
+        _STR_MEMO[id(x)] = (x, digest) # holding a reference to `x` keeps its id from being reused
+        _str_memo_chars += len(x)
+        while _str_memo_chars > _STR_MEMO_CHARS:
+            _, (old, _) = _STR_MEMO.popitem(last=False)
+            _str_memo_chars -= len(old)
+    
+    return digest
+
+def _canonical_update(h, x):
+    if x is None or isinstance(x, (bool, int, float)):
+        h.update(b"p%s;" % repr(x).encode())
+    elif isinstance(x, str):
+        if len(x) >= _STR_MEMO_MIN:
+            h.update(b"S" + _str_digest(x))
+        else:
+            b = x.encode('utf-8', 'surrogatepass')
+            h.update(b"s%d:" % len(b))
+            h.update(b)
+    elif isinstance(x, bytes):
+        h.update(b"b%d:" % len(x))
+        h.update(x)
+    elif isinstance(x, dict):
+        h.update(b"d%d{" % len(x))
+        for k in sorted(x.keys(), key=repr):
+            _canonical_update(h, k)
+            _canonical_update(h, x[k])
+        h.update(b"}")
+    elif isinstance(x, (list, tuple)):
+        h.update(b"l%d[" % len(x))
+        for v in x:
+            _canonical_update(h, v)
+        h.update(b"]")
+    elif isinstance(x, (set, frozenset)):
+        _canonical_update(h, sorted(x, key=repr))
+    elif hasattr(x, 'model_dump'):
+        h.update(b"m" + type(x).__name__.encode())
+        _canonical_update(h, x.model_dump())
+    else:
+        h.update(b"r")
+        _canonical_update(h, repr(x))
+
+def make_cache_key(fn_name, params):
+    h = hashlib.blake2b(KEY_VERSION, digest_size=16)
+    _canonical_update(h, fn_name)
+    _canonical_update(h, params)
+    return h.hexdigest()
+
+def make_legacy_cache_key(fn_name, params):
+    cache_str = '-> '.join([fn_name, str(sorted(params.items()))])
+    return hashlib.md5(cache_str.encode()).hexdigest()
+
+def _describe(fn_name, params, max_chars=80):
+    def _short(v):
+        v = repr(v)
+        return v if len(v) <= max_chars else v[:max_chars] + '...'
+    
+    return f"{fn_name}({', '.join(f'{k}={_short(v)}' for k, v in params.items())})"
+
+# --
+# Eviction
+
+EVICT_EVERY = 64 # run an eviction pass every N writes to a namespace
+
+def parse_cache_policy(spec):
+    """
+        "scrape/jina:max_bytes=2e10,eviction=lfu" -> ("./.cache/scrape/jina", {"max_bytes" : 20000000000, "eviction" : "lfu"})
+        
+        namespaces are relative to ./.cache (so `JDR_CACHE_ROOT` still applies)
+    """
+    types = {"max_bytes" : lambda v: int(float(v)), "max_entries" : lambda v: int(float(v)), "ttl" : float, "eviction" : str}
+    
+    namespace, _, fields = spec.strip().partition(":")
+    policy = {}
+    for field in filter(None, fields.split(",")):
+        k, _, v = field.partition("=")
+        if k not in types:
+            raise ValueError(f"Unknown cache policy field {k} in {spec} - must be one of {list(types.keys())}")
+        policy[k] = types[k](v)
+    
+    return "./.cache/" + namespace.strip().strip("/"), policy
+
+# per-namespace policies for namespaces whose decorators don't set one, e.g.
+#   JDR_CACHE_POLICY="scrape/jina:max_bytes=2e10;completion:max_entries=1e6,eviction=lfu"
+CACHE_POLICIES = {
+    os.path.normpath(cache_dir) : policy
+    for cache_dir, policy in (parse_cache_policy(spec) for spec in os.environ.get("JDR_CACHE_POLICY", "").split(";") if spec.strip())
+}
+
+def set_cache_policy(cache_dir, **policy):
+    """ set max_bytes / max_entries / ttl / eviction for a namespace and schedule an eviction pass """
+    cache_dir    = resolve_cache_dir(cache_dir)
+    store        = _CACHE_STORES.get(cache_dir) or get_backend(cache_dir)
+    store.policy = CachePolicy(**policy)
+    _CACHE_STORES[cache_dir] = store
+    _schedule_eviction(cache_dir)
+
+_EVICTING = set()
+
+def _schedule_eviction(cache_dir):
+    if CACHE_MODE in ["readonly", "replay"]:
+        return
+    
+    store  = _CACHE_STORES[cache_dir]
+    policy = getattr(store, 'policy', None)
+    if policy is None or (policy.ttl is None and policy.max_bytes is None and policy.max_entries is None):
+        return
+    
+    if cache_dir in _EVICTING:
+        return
+    
+    _EVICTING.add(cache_dir)
+    _IO_POOL.submit(_evict, cache_dir)
+
+def _evict(cache_dir, batch_size=256):
+    try:
+        n_deleted = _CACHE_STORES[cache_dir].evict(batch_size=batch_size)
+        _CACHE_STATS[cache_dir]['n_eviction_passes'] += 1
+    except Exception as e:
+        rprint(f"[red]disk_cache: Error evicting: {cache_dir} {e}[/red]")
+        n_deleted = 0
+    finally:
+        _EVICTING.discard(cache_dir)
+    
+    # still (probably) over budget - keep going, one batch at a time
+    if n_deleted >= batch_size:
+        _schedule_eviction(cache_dir)
+
+# --
+# Decorator
+
+def disk_cache(cache_dir='./.cache/search', verbose=False, ignore_fields=None, backend=None, 
+               max_bytes=None, max_entries=None, ttl=None, eviction="lru", memory_bytes=None, compress=None, on_result=None):
     """
     Decorator that caches function results to disk.
     Works with both synchronous and asynchronous functions.
@@ -23,54 +275,132 @@ def disk_cache(cache_dir='./.cache/search', verbose=False, ignore_fields=None):
     Args:
         cache_dir: Directory to store cache files
         verbose: Whether to print cache status messages
+        backend: "sqlite" (default, see `JDR_CACHE_BACKEND`), "pickle" (legacy one-file-per-entry) or a backend instance
+        max_bytes, max_entries, ttl, eviction: namespace retention policy (see `jdr.cache.CachePolicy`) - 
+            enforced incrementally in the background
+        memory_bytes: size of the in-process LRU tier in front of the backend (default `JDR_CACHE_MEMORY_BYTES`, 0 = off)
+        compress: None or "zstd" (default `JDR_CACHE_COMPRESS`) - compressed and uncompressed entries can always be read
+        on_result: `on_result(params, result)` after every successful call, cached or not - run in the background 
+            on the cache I/O pool (e.g. to index results)
+    
+    Reads / writes follow the process-wide cache mode (`JDR_CACHE_MODE` / `set_cache_mode`).
     """
-    os.makedirs(cache_dir, exist_ok=True)
+    policy    = {"max_bytes" : max_bytes, "max_entries" : max_entries, "ttl" : ttl, "eviction" : eviction}
+    policy.update(CACHE_POLICIES.get(os.path.normpath(cache_dir), {})) # `JDR_CACHE_POLICY` wins
+    
+    cache_dir = resolve_cache_dir(cache_dir)
+    store = _CACHE_STORES[cache_dir] = get_backend(cache_dir, backend)
+    stats = _CACHE_STATS[cache_dir]
+    
+    if any(policy[k] is not None for k in ["max_bytes", "max_entries", "ttl"]):
+        set_cache_policy(cache_dir, **policy)
+    
+    if compress is None:
+        compress = DEFAULT_COMPRESS
+    
+    if cache_dir not in _CACHE_CODECS or compress is not None:
+        _CACHE_CODECS[cache_dir] = Codec(cache_dir, compress=compress)
+    codec = _CACHE_CODECS[cache_dir]
+    
+    if memory_bytes is None:
+        memory_bytes = DEFAULT_MEMORY_BYTES
+    
+    if memory_bytes > 0:
+        # namespaces shared by several decorators share one tier
+        if cache_dir not in _CACHE_MEMORY:
+            _CACHE_MEMORY[cache_dir] = MemoryTier(memory_bytes)
+        _CACHE_MEMORY[cache_dir].max_bytes = max(_CACHE_MEMORY[cache_dir].max_bytes, memory_bytes)
+    
+    # checked once per decorator: a marked namespace, or an un-migrated `.pkl` tree (always pre-v2 keys)
+    legacy_keys = LEGACY_KEYS == "1" or (LEGACY_KEYS == "auto" and (os.path.exists(os.path.join(cache_dir, LEGACY_MARKER)) or has_pickles(cache_dir)))
     
     def decorator(func):
-        @wraps(func)
-        async def async_wrapper(*args, **kwargs):
-            # Get cache key and path
-            cache_str, cache_path = _get_cache_info(func, args, kwargs)
+        inflight = {} # cache_key -> [task, n_waiters]
+        
+        # bind the signature once, not per call
+        sig               = inspect.signature(func)
+        defaults          = {k:v.default for k, v in sig.parameters.items() if v.default is not v.empty}
+        positional_params = list(sig.parameters.keys())
+        
+        async def _acompute(cache_key, params, args, kwargs):
+            loop = asyncio.get_running_loop()
             
             # Return cached result if it exists
-            cached_result = _try_get_cached_result(cache_path, cache_str, verbose)
-            if cached_result is not None:
-                return cached_result
-                
+            if CACHE_MODE != "record":
+                cached_result = await loop.run_in_executor(_IO_POOL, _try_get_cached_result, cache_key, params, verbose)
+                if cached_result is not None:
+                    stats['hits'] += 1
+                    _notify(params, cached_result)
+                    return cached_result, "hit"
+            
             # Calculate result and cache it
+            stats['misses'] += 1
+            _check_replay(cache_key, params)
             result = await func(*args, **kwargs)
-            _save_to_cache(result, cache_path, cache_str, verbose)
-            return result
+            if CACHE_MODE != "readonly":
+                await loop.run_in_executor(_IO_POOL, _save_to_cache, result, cache_key, params, verbose)
+            _notify(params, result)
+            return result, "miss"
+        
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            # Get cache key
+            params, cache_key = _get_cache_info(func, args, kwargs)
+            
+            # Single-flight: concurrent callers with the same key share one task
+            coalesced = cache_key in inflight
+            if coalesced:
+                stats['coalesced'] += 1
+                entry = inflight[cache_key]
+            else:
+                task  = asyncio.ensure_future(_acompute(cache_key, params, args, kwargs))
+                entry = inflight[cache_key] = [task, 0]
+                task.add_done_callback(lambda _: inflight.pop(cache_key, None))
+            
+            task      = entry[0]
+            entry[1] += 1
+            try:
+                result, status = await asyncio.shield(task)
+                _CACHE_STATUS.set("coalesced" if coalesced else status)
+                return result
+            except asyncio.CancelledError:
+                # only cancel the shared call once every caller has given up on it
+                if entry[1] == 1 and not task.done():
+                    task.cancel()
+                raise
+            finally:
+                entry[1] -= 1
             
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            # Get cache key and path
-            cache_str, cache_path = _get_cache_info(func, args, kwargs)
+            # Get cache key
+            params, cache_key = _get_cache_info(func, args, kwargs)
             
             # Return cached result if it exists
-            cached_result = _try_get_cached_result(cache_path, cache_str, verbose)
-            if cached_result is not None:
-                return cached_result
+            if CACHE_MODE != "record":
+                cached_result = _try_get_cached_result(cache_key, params, verbose)
+                if cached_result is not None:
+                    stats['hits'] += 1
+                    _CACHE_STATUS.set("hit")
+                    _notify(params, cached_result)
+                    return cached_result
                 
             # Calculate result and cache it
+            stats['misses'] += 1
+            _check_replay(cache_key, params)
             result = func(*args, **kwargs)
-            _save_to_cache(result, cache_path, cache_str, verbose)
+            if CACHE_MODE != "readonly":
+                _save_to_cache(result, cache_key, params, verbose)
+            _CACHE_STATUS.set("miss")
+            _notify(params, result)
             return result
         
         def _get_cache_info(func, args, kwargs):
-            # Get the function signature
-            sig = inspect.signature(func)
-            
             # Create a dictionary of all parameters with their values
-            params = {}
-            
             # First, fill in with default values
-            for param_name, param in sig.parameters.items():
-                if param.default is not param.empty:
-                    params[param_name] = param.default
+            params = dict(defaults)
             
             # Then update with positional arguments
-            positional_params = list(sig.parameters.keys())
             for i, arg in enumerate(args):
                 if i < len(positional_params):
                     params[positional_params[i]] = arg
@@ -83,32 +413,81 @@ def disk_cache(cache_dir='./.cache/search', verbose=False, ignore_fields=None):
                     if field in params:
                         del params[field]
             
-            cache_str = '-> '.join([func.__name__, str(sorted(params.items()))])
-            cache_key = hashlib.md5(''.join(cache_str).encode()).hexdigest()
-            cache_path = os.path.join(cache_dir, f"{cache_key}.pkl")
-            
-            return cache_str, cache_path
+            return params, make_cache_key(func.__name__, params)
+        
+        def _run_on_result(params, result):
+            try:
+                on_result(params, result)
+            except Exception as e:
+                rprint(f"[red]disk_cache: Error in on_result: {_describe(func.__name__, params)} {e}[/red]")
         
-        def _try_get_cached_result(cache_path, cache_str, verbose):
-            if os.path.exists(cache_path):
-                try:
-                    out = pickle.load(open(cache_path, 'rb'))
+        def _notify(params, result):
+            if on_result is not None and CACHE_MODE not in ["readonly", "replay"]: # hooks have side effects (e.g. indexing) - a read-only run must not write
+                _IO_POOL.submit(_run_on_result, params, result)
+        
+        def _check_replay(cache_key, params):
+            if CACHE_MODE == "replay":
+                stats['replay_misses'] += 1
+                raise CacheMissError(cache_dir, cache_key, _describe(func.__name__, params))
+        
+        def _get_entry(cache_key):
+            """ -> (value, created), so the memory tier's ttl runs from when the entry was written (not read) """
+            if hasattr(store, 'get_entry'):
+                return store.get_entry(cache_key) or (None, None)
+            return store.get(cache_key), None
+        
+        def _legacy_lookup(cache_key, params):
+            legacy_key = make_legacy_cache_key(func.__name__, params)
+            value      = store.get(legacy_key)
+            if value is not None:
+                if CACHE_MODE in ["readwrite", "record"]:
+                    store.set(cache_key, value) # copy forward, so the next lookup hits the v2 key directly
+                stats['legacy_hits'] += 1
+            return value
+        
+        def _try_get_cached_result(cache_key, params, verbose):
+            memory = _CACHE_MEMORY.get(cache_dir)
+            try:
+                value = None
+                if memory is not None:
+                    value = memory.get(cache_key, ttl=getattr(store, 'policy', CachePolicy()).ttl)
+                
+                if value is None:
+                    value, created = _get_entry(cache_key)
+                    if value is None and legacy_keys:
+                        value, created = _legacy_lookup(cache_key, params), None
+                    
+                    if value is not None:
+                        value = codec.decode(value)
+                        if memory is not None:
+                            memory.set(cache_key, value, created=created)
+                
+                if value is not None:
+                    out = pickle.loads(value)
                     if verbose:
-                        rprint(f"[green]disk_cache: Loaded from cache[/green] {cache_path}")
+                        rprint(f"[green]disk_cache: Loaded from cache[/green] {cache_dir} {cache_key}")
                     return out
-                except Exception as e:
-                    rprint(f"[red]disk_cache: Error loading cache: {cache_dir} {cache_path} {e}[/red]")
-            else:
-                if verbose:
-                    rprint(f"[yellow]disk_cache: No cache found[/yellow] {cache_dir} {cache_path} - Running")
+            except Exception as e:
+                rprint(f"[red]disk_cache: Error loading cache: {cache_dir} {cache_key} {e}[/red]")
+                return None
+            
+            if verbose:
+                rprint(f"[yellow]disk_cache: No cache found[/yellow] {cache_dir} {cache_key} - Running")
             return None
         
-        def _save_to_cache(result, cache_path, cache_str, verbose):
+        def _save_to_cache(result, cache_key, params, verbose):
             try:
-                with open(cache_path, 'wb') as f:
-                    pickle.dump(result, f)
+                value = pickle.dumps(result)
+                store.set(cache_key, codec.encode(value))
+                if cache_dir in _CACHE_MEMORY:
+                    _CACHE_MEMORY[cache_dir].set(cache_key, value)
             except Exception as e:
-                rprint(f"[red]disk_cache: Error saving to cache: {cache_str} {e}[/red]")
+                rprint(f"[red]disk_cache: Error saving to cache: {_describe(func.__name__, params)} {e}[/red]")
+                return
+            
+            stats['writes'] += 1
+            if stats['writes'] % EVICT_EVERY == 0:
+                _schedule_eviction(cache_dir)
         
         # Return appropriate wrapper based on whether the function is async or not
         if asyncio.iscoroutinefunction(func):